@@ -0,0 +1,121 @@
+"""
+OpenAI Batch API submission for bulk theme generation
+
+For non-interactive work — rendering a gallery of many names offline —
+the Batch API costs half the synchronous price and sidesteps rate limits,
+at the cost of an up-to-24h completion window. Interactive requests
+should keep using theme_generator.generate_theme_variations.
+"""
+
+import io
+import json
+import time
+
+from .theme_generator import _build_prompt, _get_openai
+
+# Batch jobs in one of these states will never make further progress
+_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def _batch_request_line(name, theme, model):
+    """One JSONL line for the batch input file."""
+    letters = [c.upper() for c in name if c.isalpha()]
+    return {
+        # custom_id is how results map back to inputs after completion
+        "custom_id": f"{name}|{theme}",
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [{"role": "user", "content": _build_prompt(letters, theme)}],
+            "response_format": {"type": "json_object"},
+        },
+    }
+
+
+def submit_batch(jobs, model="gpt-4o-mini"):
+    """
+    Submit (name, theme) pairs as one OpenAI Batch API job.
+
+    Args:
+        jobs (list): (name, theme) pairs to generate themes for
+        model (str): Chat model to run each request against
+
+    Returns:
+        str: Batch id to poll with poll_batch, or None if submission failed
+    """
+    if not jobs:
+        return None
+
+    client = _get_openai()
+
+    jsonl = "\n".join(
+        json.dumps(_batch_request_line(name, theme, model))
+        for name, theme in jobs
+    )
+
+    try:
+        print(f"📦 Submitting batch of {len(jobs)} theme jobs ({model})...")
+        input_file = client.files.create(
+            file=io.BytesIO(jsonl.encode()),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"✅ Batch submitted: {batch.id}")
+        return batch.id
+    except Exception as e:
+        print(f"❌ Batch submission failed: {e}")
+        return None
+
+
+def poll_batch(batch_id, poll_interval_seconds=60):
+    """
+    Wait for a batch to finish and map results back to (name, theme) pairs.
+
+    Args:
+        batch_id (str): Id returned by submit_batch
+        poll_interval_seconds (int): Seconds between status checks
+
+    Returns:
+        dict: {(name, theme): variations list or None} per input pair,
+              or None if the batch itself failed
+    """
+    client = _get_openai()
+
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in _TERMINAL_STATUSES:
+            break
+        print(f"⏳ Batch {batch_id}: {batch.status} — next check in {poll_interval_seconds}s")
+        time.sleep(poll_interval_seconds)
+
+    if batch.status != "completed":
+        print(f"❌ Batch {batch_id} ended as {batch.status}")
+        return None
+
+    results = {}
+    output = client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        name, theme = record["custom_id"].split("|", 1)
+        try:
+            content = record["response"]["body"]["choices"][0]["message"]["content"]
+            parsed = json.loads(content)
+            # json_object mode may wrap the array in a key
+            if isinstance(parsed, dict):
+                parsed = next(
+                    (v for v in parsed.values() if isinstance(v, list)), None
+                )
+            results[(name, theme)] = parsed
+        except (KeyError, IndexError, json.JSONDecodeError) as e:
+            print(f"⚠️ Could not parse batch result for '{name}': {e}")
+            results[(name, theme)] = None
+
+    print(f"✅ Batch {batch_id} complete: {len(results)} results")
+    return results
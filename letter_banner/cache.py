@@ -0,0 +1,96 @@
+"""
+Idempotency cache for generated letters
+Re-running a banner after a partial failure skips letters that were
+already generated — an O(1) disk lookup instead of a paid API call
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+# JSON index inside the output directory mapping cache key → letter path
+_INDEX_FILENAME = ".cache_index.json"
+
+# Guards concurrent read-modify-write of the index file
+_index_lock = threading.Lock()
+
+# Single-flight locks, one per cache key: when two jobs request the same
+# (letter, object, palette, model) at once, the second waits for the first
+# instead of paying for a duplicate API call
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def key_lock(key):
+    """Return the shared lock for one cache key (created on first use)."""
+    with _key_locks_guard:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def cache_key(letter, object_description, color_palette, model):
+    """Stable digest identifying one letter-generation request."""
+    palette_repr = ""
+    if color_palette:
+        palette_repr = "|".join(color_palette["colors"]) + "|" + color_palette["mood"]
+    raw = "\x1f".join([letter.upper(), object_description, palette_repr, model])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _index_path(output_dir):
+    return os.path.join(output_dir, _INDEX_FILENAME)
+
+
+def _load_index(output_dir):
+    try:
+        with open(_index_path(output_dir)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def lookup(output_dir, key):
+    """Return the cached letter path for key, or None if absent/stale."""
+    with _index_lock:
+        letter_path = _load_index(output_dir).get(key)
+    if letter_path and os.path.exists(letter_path):
+        return letter_path
+    return None
+
+
+def materialize(cached_path, dest_path):
+    """
+    Surface a cache hit inside the current run's directory.
+
+    Hardlinked rather than returned in place: the hit may live in an older
+    job's directory, and job cleanup deleting that directory must not take
+    the file away from the run that reused it. Falls back to a copy when
+    the link fails (cross-device, unsupported filesystem).
+    """
+    if os.path.realpath(cached_path) == os.path.realpath(dest_path):
+        return cached_path
+    try:
+        os.link(cached_path, dest_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        import shutil
+        shutil.copyfile(cached_path, dest_path)
+    return dest_path
+
+
+def store(output_dir, key, letter_path):
+    """Record a successfully generated letter in the index."""
+    try:
+        with _index_lock:
+            index = _load_index(output_dir)
+            index[key] = letter_path
+            os.makedirs(output_dir, exist_ok=True)
+            with open(_index_path(output_dir), 'w') as f:
+                json.dump(index, f, indent=2)
+    except OSError as e:
+        # The cache is an optimization — never fail generation over it
+        log.warning(f"⚠️ Could not update letter cache index: {e}")
@@ -81,12 +81,18 @@ COLOR_PALETTES = {
     }
 }
 
+# Palette keys and items in display order, computed once instead of
+# rebuilding lists on every menu display/selection
+_PALETTE_KEYS = tuple(COLOR_PALETTES)
+_PALETTE_LIST = tuple(COLOR_PALETTES.items())
+
+
 def display_color_palettes():
     """Display available color palettes for user selection."""
     print("\n🎨 Available Color Palettes:")
     print("=" * 50)
-    
-    for i, (key, palette) in enumerate(COLOR_PALETTES.items(), 1):
+
+    for i, (key, palette) in enumerate(_PALETTE_LIST, 1):
         print(f"\n{i}. {palette['name']}")
         print(f"   Colors: {palette['description']}")
         print(f"   Style: {palette['mood']}")
@@ -120,8 +126,7 @@ def select_color_palette():
             try:
                 choice_num = int(choice)
                 if 1 <= choice_num <= len(palettes):
-                    palette_key = list(palettes.keys())[choice_num - 1]
-                    selected = palettes[palette_key]
+                    selected = palettes[_PALETTE_KEYS[choice_num - 1]]
                     print(f"✅ Selected: {selected['name']}")
                     return selected
                 else:
@@ -14,15 +14,17 @@ DEFAULT_IMAGE_FORMAT = "png"
 # Retry settings for API calls
 MAX_RETRIES_PER_LETTER = 3
 RETRY_DELAY_SECONDS = 10
+RETRY_BASE_DELAY_SECONDS = 2  # Base for jittered exponential backoff (2s, 4s, 8s, ... capped at 60s)
+
+# Maximum concurrent letter-generation API calls (bounded to respect provider rate limits)
+MAX_CONCURRENT_REQUESTS = 8
+
+# Token-bucket throttle for outbound generation calls (stay under provider RPM quota)
+REQUESTS_PER_MINUTE = 60
 
 # Default output directory for letter banners
 OUTPUT_DIR = "output"
 
-# Template settings
-TEMPLATE_FONT_SIZE = 600
-TEMPLATE_BACKGROUND_COLOR = "white"
-TEMPLATE_TEXT_COLOR = "black"
-
 # Model configurations
 DEFAULT_MODEL = "gemini-3-pro-image-preview"
 
@@ -4,14 +4,58 @@ Google Gemini API client for letter banner generation
 
 import os
 import time
-import base64
+import random
+import logging
+import functools
 from io import BytesIO
 from PIL import Image
 
 from google import genai
+from google.genai import errors as genai_errors
 from google.genai import types
 
 from . import config
+from .rate_limiter import gemini_rate_limiter
+from .utils import PNG_SIGNATURE, ensure_banner_output_dir, safe_object_name, verify_png_file
+
+log = logging.getLogger(__name__)
+
+# HTTP status codes where retrying cannot help (bad request, auth, missing model)
+_NON_RETRIABLE_CODES = {400, 401, 403, 404}
+
+# Shared client instance - construction parses env vars and sets up auth and
+# connection pools, so build it once and reuse it across all calls. The
+# google-genai client is thread-safe, so concurrent letter generation can
+# share it (and its connection pool) too.
+_client = None
+
+
+def get_client():
+    """Return the shared Gemini client, creating it on first use."""
+    global _client
+    if _client is None:
+        # Client() automatically reads GEMINI_API_KEY from the environment
+        _client = genai.Client()
+    return _client
+
+
+def _is_retriable(exc):
+    """
+    Whether a Gemini API error is worth retrying.
+
+    Rate limits (429), server errors (5xx), and timeouts are transient;
+    auth, permission, and invalid-request errors will fail identically on
+    every attempt, so retrying them only wastes time.
+    """
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code not in _NON_RETRIABLE_CODES
+    # Unknown exception types (network hiccups, SDK internals) — retry
+    return True
+
+
+def _retry_delay(retry_attempt):
+    """Jittered exponential backoff delay for the given retry attempt (1-based)."""
+    return min(60, config.RETRY_BASE_DELAY_SECONDS * (2 ** (retry_attempt - 1)) + random.uniform(0, 1))
 
 
 def _friendly_error(exc):
@@ -31,144 +75,272 @@ def _friendly_error(exc):
     return msg[:200] if len(msg) > 200 else msg
 
 
-def generate_stylized_letter_gemini(letter, object_description, output_dir, run_timestamp, color_palette=None):
+# Prompt template for stylized letter generation, built once at import time
+# instead of being re-assembled from f-string pieces for every letter
+_PROMPT_TEMPLATE = (
+    "Create ONLY the letter '{letter}' as a decorative design inspired by {obj}. "
+    "The letter should be clearly recognizable as '{letter}' with artistic decorations, "
+    "patterns, and motifs that represent {obj}.{color_guidance} "
+    "CRITICAL: The background MUST be plain solid white (#FFFFFF). No transparency, "
+    "no checkerboard patterns, no gradients — just a clean white background. "
+    "Do not include any frames, borders, or environmental elements. "
+    "Only generate the letter itself with decorative elements integrated into the letter shape."
+)
+
+
+@functools.lru_cache(maxsize=16)
+def _color_guidance_fragment(colors, mood):
+    """
+    Precomputed color-guidance prompt fragment for a palette.
+
+    Keyed by the (hashable) colors tuple and mood so the join is done once
+    per palette per run instead of once per letter; custom palettes cache
+    just as well as the built-ins.
+    """
+    return f" Use this specific color palette: {', '.join(colors)}. Style it with {mood}."
+
+
+def _build_letter_prompt(letter, object_description, color_palette=None):
+    """Build the image-generation prompt for a single stylized letter."""
+    # Build color guidance for the prompt
+    color_guidance = ""
+    if color_palette:
+        color_guidance = _color_guidance_fragment(
+            tuple(color_palette["colors"]), color_palette["mood"]
+        )
+
+    # format_map skips the kwargs-dict packing that .format() does — a small
+    # but free win when building prompts in a loop for batch/concurrent runs
+    return _PROMPT_TEMPLATE.format_map({
+        "letter": letter.upper(),
+        "obj": object_description,
+        "color_guidance": color_guidance,
+    })
+
+
+# Upper bound on candidates per request — larger batches balloon response
+# size and memory without improving pick quality much
+MAX_CANDIDATES_PER_REQUEST = 4
+
+
+def _image_generation_config(num_candidates=1):
+    """Shared GenerateContentConfig for letter image generation."""
+    return types.GenerateContentConfig(
+        response_modalities=['IMAGE'],  # Only request image output
+        candidate_count=num_candidates,
+        image_config=types.ImageConfig(
+            aspect_ratio="1:1",  # Square format for letters
+            image_size="1K"  # 1024x1024 - Options: 1K, 2K, 4K
+        )
+    )
+
+
+def generate_stylized_letter_gemini(letter, object_description, output_dir, run_timestamp, color_palette=None, num_candidates=1):
     """
     Generate a stylized letter inspired by the specified interest using Google Gemini.
-    
+
     Args:
         letter (str): The letter to generate
         object_description (str): Interest/theme to inspire the letter design
         output_dir (str): Output directory
         run_timestamp (str): Timestamp for this run
         color_palette (dict): Color palette to use for consistent styling
-    
+        num_candidates (int): Number of image variants to request in the one
+            API call (1-4). Multiple candidates share a single round trip, so
+            variant generation avoids N x call latency.
+
     Returns:
-        str: Path to the generated letter image, or None if failed
+        str: Path to the generated letter image (num_candidates=1), or a list
+             of variant paths (num_candidates>1); None/empty if failed
     """
-    print(f"\n--- Generating Letter '{letter.upper()}' inspired by {object_description} (Gemini) ---")
-    
-    # Build color guidance for the prompt
-    color_guidance = ""
-    if color_palette:
-        colors_str = ", ".join(color_palette["colors"])
-        color_guidance = f" Use this specific color palette: {colors_str}. Style it with {color_palette['mood']}."
-    
-    # Create prompt for stylized letter based on interest/theme
-    prompt = f"Create ONLY the letter '{letter.upper()}' as a decorative design inspired by {object_description}. The letter should be clearly recognizable as '{letter.upper()}' with artistic decorations, patterns, and motifs that represent {object_description}.{color_guidance} CRITICAL: The background MUST be plain solid white (#FFFFFF). No transparency, no checkerboard patterns, no gradients — just a clean white background. Do not include any frames, borders, or environmental elements. Only generate the letter itself with decorative elements integrated into the letter shape."
-    
-    print(f"Prompt: {prompt}")
-    
+    if not 1 <= num_candidates <= MAX_CANDIDATES_PER_REQUEST:
+        raise ValueError(f"num_candidates must be between 1 and {MAX_CANDIDATES_PER_REQUEST}, got {num_candidates}")
+
+    log.info(f"\n--- Generating Letter '{letter.upper()}' inspired by {object_description} (Gemini) ---")
+
+    prompt = _build_letter_prompt(letter, object_description, color_palette)
+
+    log.debug(f"Prompt: {prompt}")
+
     # Generate the stylized letter
     generated_path = _generate_image_with_retry(
         prompt=prompt,
         output_dir=output_dir,
         letter=letter,
         object_description=object_description,
-        run_timestamp=run_timestamp
+        run_timestamp=run_timestamp,
+        num_candidates=num_candidates
     )
-    
+
     return generated_path
 
 
-def _generate_image_with_retry(prompt, output_dir, letter, object_description, run_timestamp):
+def _generate_image_with_retry(prompt, output_dir, letter, object_description, run_timestamp, num_candidates=1):
     """
     Generate image with retry logic for failures.
     """
-    # Initialize Gemini client - it will automatically use GEMINI_API_KEY from environment
-    # The Client() constructor automatically reads from GEMINI_API_KEY env var
-    client = genai.Client()
-    
+    client = get_client()
+
     # Retry logic for failures
     for retry_attempt in range(config.MAX_RETRIES_PER_LETTER):
         try:
             if retry_attempt > 0:
-                print(f"Retry attempt {retry_attempt + 1}/{config.MAX_RETRIES_PER_LETTER}")
-                print(f"Waiting {config.RETRY_DELAY_SECONDS} seconds before retry...")
-                time.sleep(config.RETRY_DELAY_SECONDS)
+                delay = _retry_delay(retry_attempt)
+                log.info(f"Retry attempt {retry_attempt + 1}/{config.MAX_RETRIES_PER_LETTER}")
+                log.info(f"Waiting {delay:.1f} seconds before retry...")
+                time.sleep(delay)
             
-            print(f"Attempting image generation for letter '{letter.upper()}' with Gemini...")
+            log.info(f"Attempting image generation for letter '{letter.upper()}' with Gemini...")
             
             # Use Gemini image generation with gemini-3-pro-image-preview model (Nano Banana Pro)
-            response = client.models.generate_content(
-                model="gemini-3-pro-image-preview",
-                contents=[prompt],
-                config=types.GenerateContentConfig(
-                    response_modalities=['IMAGE'],  # Only request image output
-                    image_config=types.ImageConfig(
-                        aspect_ratio="1:1",  # Square format for letters
-                        image_size="1K"  # 1024x1024 - Options: 1K, 2K, 4K
-                    )
+            # Throttle submissions so concurrent letters stay under the RPM quota
+            with gemini_rate_limiter:
+                response = client.models.generate_content(
+                    model="gemini-3-pro-image-preview",
+                    contents=[prompt],
+                    config=_image_generation_config(num_candidates)
                 )
-            )
-            
-            print(f"API request sent to Gemini for letter '{letter.upper()}'")
-            
-            # Process the response
+
+            log.info(f"API request sent to Gemini for letter '{letter.upper()}'")
+
+            # Process the response - each candidate carries its own image
             if response.candidates and len(response.candidates) > 0:
-                for part in response.candidates[0].content.parts:
-                    if part.inline_data is not None:
-                        print(f"Image data received for letter '{letter.upper()}'.")
-                        
-                        # Use the as_image() method to get PIL Image directly
-                        image = part.as_image()
-                        
-                        # Save the image directly
-                        return _save_gemini_image(
-                            image, letter, object_description, output_dir, run_timestamp
-                        )
-                    elif part.text is not None:
-                        print(f"Text response: {part.text}")
-                
-                print(f"❌ No image data received for letter '{letter.upper()}'")
+                variant_paths = []
+                for candidate_index, candidate in enumerate(response.candidates):
+                    for part in candidate.content.parts:
+                        if part.inline_data is not None:
+                            log.info(f"Image data received for letter '{letter.upper()}'.")
+
+                            raw_bytes = part.inline_data.data
+                            if part.inline_data.mime_type == 'image/png' and raw_bytes and _png_is_opaque(raw_bytes):
+                                # Already an opaque PNG — write the model's own
+                                # bytes and skip the PIL decode + zlib re-encode
+                                image = raw_bytes
+                            else:
+                                # Use the as_image() method to get PIL Image directly
+                                image = part.as_image()
+
+                            variant_paths.append(_save_gemini_image(
+                                image, letter, object_description, output_dir, run_timestamp,
+                                variant=candidate_index if num_candidates > 1 else None
+                            ))
+                            break
+                        elif part.text is not None:
+                            log.info(f"Text response: {part.text}")
+
+                if variant_paths:
+                    # Single-candidate callers keep getting a plain path
+                    return variant_paths if num_candidates > 1 else variant_paths[0]
+
+                log.error(f"❌ No image data received for letter '{letter.upper()}'")
                 continue
             else:
-                print(f"❌ No response data received for letter '{letter.upper()}'")
+                log.error(f"❌ No response data received for letter '{letter.upper()}'")
                 continue
 
         except Exception as e:
             last_error = _friendly_error(e)
-            print(f"❌ Error generating letter '{letter.upper()}' with Gemini: {e}")
+            log.error(f"❌ Error generating letter '{letter.upper()}' with Gemini: {e}")
+            if not _is_retriable(e):
+                # Auth/permission/invalid-request errors fail the same way
+                # every time — bail out immediately instead of backing off
+                log.info(f"   Error is not retriable, giving up on letter '{letter.upper()}'")
+                raise RuntimeError(last_error)
             if retry_attempt < config.MAX_RETRIES_PER_LETTER - 1:
-                print(f"   Will retry in {config.RETRY_DELAY_SECONDS} seconds...")
+                log.info("   Will retry with exponential backoff...")
                 continue
             else:
-                print(f"   Max retries exceeded for letter '{letter.upper()}'")
+                log.info(f"   Max retries exceeded for letter '{letter.upper()}'")
                 raise RuntimeError(last_error)
 
     # If we get here, all retries failed (no image data received)
-    print(f"❌ All {config.MAX_RETRIES_PER_LETTER} retry attempts failed for letter '{letter.upper()}'")
+    log.error(f"❌ All {config.MAX_RETRIES_PER_LETTER} retry attempts failed for letter '{letter.upper()}'")
     raise RuntimeError("No image data returned by Gemini API after multiple retries")
 
 
-def _save_generated_image(image_bytes, letter, object_description, output_dir, run_timestamp):
-    """Save the generated image with appropriate naming (for OpenAI)."""
-    import shutil
-    
-    # Create output directory
-    banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
-    os.makedirs(banner_output_dir, exist_ok=True)
-    
-    # Create filename
-    letter_basename = f"letter_{letter.upper()}_{object_description.replace(' ', '_').replace(',', '')}"
-    new_letter_name = f"{letter_basename}_{run_timestamp}.png"
-    new_letter_path = os.path.join(banner_output_dir, new_letter_name)
-    
-    # Save image and check transparency
-    img_from_bytes = Image.open(BytesIO(image_bytes))
-    
-    # Debug: Check if image has transparency
-    has_transparency = img_from_bytes.mode in ('RGBA', 'LA') or 'transparency' in img_from_bytes.info
-    print(f"🔍 Image mode: {img_from_bytes.mode}, Has transparency: {has_transparency}")
-    
-    # Ensure we save with transparency if available
-    if has_transparency:
-        img_from_bytes.save(new_letter_path, format="PNG", optimize=True)
-    else:
-        print(f"⚠️ Warning: Letter '{letter.upper()}' does not have transparency!")
-        img_from_bytes.save(new_letter_path, format="PNG")
-    
-    print(f"✅ Letter '{letter.upper()}' saved: {new_letter_name}")
-    return new_letter_path
+def generate_stylized_letters_batch(letters_and_objects, output_dir, run_timestamp, color_palette=None, poll_interval_seconds=30):
+    """
+    Generate all letters for a banner in a single Gemini Batch Mode job.
+
+    Batch Mode accepts every prompt in one submission and runs them
+    asynchronously (24-hour SLA) at roughly half the cost of synchronous
+    calls. This trades latency for cost and throughput, so only use it for
+    banners that are not needed in real time. Image quality may also differ
+    slightly from synchronous generation.
+
+    Args:
+        letters_and_objects (list): List of (letter, object_description) tuples
+        output_dir (str): Output directory
+        run_timestamp (str): Timestamp for this run
+        color_palette (dict): Color palette to use for consistent styling
+        poll_interval_seconds (int): Seconds between batch status polls
+
+    Returns:
+        list: Paths to the generated letter images, in input order
+              (None entries for letters that failed)
+    """
+    client = get_client()
+
+    inlined_requests = [
+        types.InlinedRequest(
+            contents=[_build_letter_prompt(letter, object_description, color_palette)],
+            config=_image_generation_config()
+        )
+        for letter, object_description in letters_and_objects
+    ]
+
+    log.info(f"\n--- Submitting batch job for {len(inlined_requests)} letters (Gemini Batch Mode) ---")
+    batch = client.batches.create(
+        model="gemini-3-pro-image-preview",
+        src=inlined_requests
+    )
+    log.info(f"Batch job submitted: {batch.name}")
+
+    # Poll until the batch reaches a terminal state
+    terminal_states = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+    while True:
+        batch = client.batches.get(name=batch.name)
+        state = batch.state.name
+        if state in terminal_states:
+            break
+        log.info(f"Batch job {batch.name} state: {state}, polling again in {poll_interval_seconds}s...")
+        time.sleep(poll_interval_seconds)
+
+    if state != "JOB_STATE_SUCCEEDED":
+        raise RuntimeError(f"Gemini batch job {batch.name} finished in state {state}")
+
+    # Route each inlined response through the normal save path
+    letter_paths = []
+    for (letter, object_description), inlined in zip(letters_and_objects, batch.dest.inlined_responses):
+        letter_path = None
+        response = inlined.response
+        if response and response.candidates:
+            for part in response.candidates[0].content.parts:
+                if part.inline_data is not None:
+                    letter_path = _save_gemini_image(
+                        part.as_image(), letter, object_description, output_dir, run_timestamp
+                    )
+                    break
+        if letter_path is None:
+            log.error(f"❌ No image data in batch response for letter '{letter.upper()}'")
+        letter_paths.append(letter_path)
+
+    return letter_paths
+
+
+def _png_is_opaque(png_bytes):
+    """
+    Cheap header check: True if the PNG has no alpha channel.
+
+    IHDR color type lives at byte 25; types 0 (grayscale) and 2 (truecolor)
+    carry no alpha, so such files need no white-background flattening and can
+    be written to disk as-is. Alpha/palette types fall back to the PIL path.
+    """
+    return (
+        len(png_bytes) > 25
+        and png_bytes.startswith(PNG_SIGNATURE)
+        and png_bytes[25] in (0, 2)
+    )
 
 
 def _flatten_to_white_background(image):
@@ -187,29 +359,37 @@ def _flatten_to_white_background(image):
     return image
 
 
-def _save_gemini_image(image, letter, object_description, output_dir, run_timestamp):
+def _save_gemini_image(image, letter, object_description, output_dir, run_timestamp, variant=None):
     """Save the Gemini PIL Image with appropriate naming."""
-    # Create output directory
-    banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
-    os.makedirs(banner_output_dir, exist_ok=True)
+    # Output directory creation is memoized — one mkdir per run, not per letter
+    banner_output_dir = ensure_banner_output_dir(output_dir, run_timestamp)
 
     # Create filename
-    letter_basename = f"letter_{letter.upper()}_{object_description.replace(' ', '_').replace(',', '')}"
+    letter_basename = f"letter_{letter.upper()}_{safe_object_name(object_description)}"
+    if variant is not None:
+        letter_basename = f"{letter_basename}_variant{variant}"
     new_letter_name = f"{letter_basename}_{run_timestamp}.png"
     new_letter_path = os.path.join(banner_output_dir, new_letter_name)
 
     try:
-        # Convert Gemini Image object to PIL Image if needed
-        if not isinstance(image, Image.Image):
-            pil_image = Image.open(BytesIO(image.image_bytes))
+        if isinstance(image, bytes):
+            # Raw opaque PNG straight from the API — no decode/re-encode needed
+            with open(new_letter_path, 'wb') as f:
+                f.write(image)
         else:
-            pil_image = image
-        # Flatten checkerboard/transparency to white background for printing
-        pil_image = _flatten_to_white_background(pil_image)
-        pil_image.save(new_letter_path, format="PNG")
-        print(f"✅ Letter '{letter.upper()}' saved: {new_letter_name}")
+            # Convert Gemini Image object to PIL Image if needed
+            if not isinstance(image, Image.Image):
+                pil_image = Image.open(BytesIO(image.image_bytes))
+            else:
+                pil_image = image
+            # Flatten checkerboard/transparency to white background for printing
+            pil_image = _flatten_to_white_background(pil_image)
+            pil_image.save(new_letter_path, format="PNG")
+        # Guard against truncated/corrupt responses producing a broken file
+        verify_png_file(new_letter_path)
+        log.info(f"✅ Letter '{letter.upper()}' saved: {new_letter_name}")
         return new_letter_path
     except Exception as e:
-        print(f"⚠️ Error saving image: {e}")
+        log.warning(f"⚠️ Error saving image: {e}")
         raise
 
@@ -4,11 +4,36 @@ Image editing utilities using image-to-image APIs
 
 import os
 import base64
+import shutil
+import logging
 from io import BytesIO
 from PIL import Image
 from openai import OpenAI
-from google import genai
 from google.genai import types
+import requests
+from requests.adapters import HTTPAdapter
+
+from .gemini_client import get_client as get_gemini_client
+from .utils import verify_png_file
+
+log = logging.getLogger(__name__)
+
+# Shared OpenAI client - constructed lazily once and reused, mirroring the
+# shared Gemini client in gemini_client.py
+_openai_client = None
+
+# Shared HTTP session for image downloads - reuses pooled TLS connections to
+# the CDN across concurrent edits instead of a fresh handshake per call
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
+
+def _get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI()
+    return _openai_client
 
 
 def edit_letter_image(image_path, edit_prompt, output_path, model="gemini-3-pro-image-preview"):
@@ -24,25 +49,26 @@ def edit_letter_image(image_path, edit_prompt, output_path, model="gemini-3-pro-
     Returns:
         str: Path to the edited image, or None if failed
     """
-    if model == "gemini-3-pro-image-preview":
-        return _edit_with_gemini(image_path, edit_prompt, output_path, model)
-    elif model == "gpt-image-1":
-        return _edit_with_openai(image_path, edit_prompt, output_path)
-    else:
+    handler = _EDIT_DISPATCH.get(model)
+    if handler is None:
         raise ValueError(f"Unsupported model for editing: {model}")
+    return handler(image_path, edit_prompt, output_path, model)
 
 
 def _edit_with_gemini(image_path, edit_prompt, output_path, model="gemini-3-pro-image-preview"):
     """Edit image using Gemini image-to-image."""
     try:
-        # Client automatically uses GEMINI_API_KEY environment variable
-        client = genai.Client()
-        
-        # Load the original image
-        original_image = Image.open(image_path)
-        
-        print(f"🖼️ Editing image with Gemini...")
-        print(f"   Edit prompt: {edit_prompt}")
+        client = get_gemini_client()
+
+        # Load the original image eagerly and close the file handle before the
+        # network call — Image.open is lazy and would otherwise keep the
+        # descriptor open until GC (a leak when editing many letters in a loop)
+        with Image.open(image_path) as img:
+            img.load()
+            original_image = img.copy()
+
+        log.info(f"🖼️ Editing image with Gemini...")
+        log.info(f"   Edit prompt: {edit_prompt}")
         
         # Use Gemini's image-to-image capability
         response = client.models.generate_content(
@@ -62,29 +88,74 @@ def _edit_with_gemini(image_path, edit_prompt, output_path, model="gemini-3-pro-
             if part.inline_data:
                 edited_image = part.as_image()
                 edited_image.save(output_path)
-                print(f"✅ Image edited and saved to: {output_path}")
+                log.info(f"✅ Image edited and saved to: {output_path}")
                 return output_path
         
-        print("❌ No image returned from Gemini edit")
+        log.error("❌ No image returned from Gemini edit")
         return None
         
     except Exception as e:
-        print(f"❌ Error editing image with Gemini: {e}")
+        log.error(f"❌ Error editing image with Gemini: {e}")
         return None
 
 
-def _edit_with_openai(image_path, edit_prompt, output_path):
+# OpenAI's edit endpoint rejects uploads larger than 4MB
+_MAX_EDIT_FILE_BYTES = 4 * 1024 * 1024
+
+
+def _prepare_image_for_edit(image_path):
+    """
+    Pre-flight an image for OpenAI's edit endpoint.
+
+    The endpoint rejects non-RGBA inputs and files over 4MB; catching those
+    locally costs microseconds versus burning a failed multi-second API round
+    trip plus its retry cycle. Returns an open file-like object ready for
+    upload — the original file when it is already valid, or an in-memory
+    BytesIO when conversion/shrinking was needed (no temp file on disk).
+    """
+    needs_rewrite = os.path.getsize(image_path) > _MAX_EDIT_FILE_BYTES
+
+    with Image.open(image_path) as img:
+        img.load()
+        prepared = img
+        if img.mode != 'RGBA':
+            prepared = img.convert('RGBA')
+            needs_rewrite = True
+
+        if not needs_rewrite:
+            return open(image_path, 'rb')
+
+        buf = BytesIO()
+        buf.name = "image.png"  # the SDK uses .name to infer the upload mime type
+        prepared.save(buf, format="PNG", optimize=True)
+
+        # Halve dimensions until the re-encoded image fits under the cap
+        while buf.getbuffer().nbytes > _MAX_EDIT_FILE_BYTES and min(prepared.size) > 256:
+            prepared = prepared.resize(
+                (prepared.width // 2, prepared.height // 2), Image.Resampling.LANCZOS
+            )
+            buf.seek(0)
+            buf.truncate()
+            prepared.save(buf, format="PNG", optimize=True)
+
+    log.info(f"   Prepared {os.path.basename(image_path)} for edit (RGBA, {buf.getbuffer().nbytes} bytes)")
+    buf.seek(0)
+    return buf
+
+
+def _edit_with_openai(image_path, edit_prompt, output_path, model="gpt-image-1"):
     """Edit image using OpenAI image editing."""
     try:
-        client = OpenAI()
-        
-        print(f"🖼️ Editing image with OpenAI...")
-        print(f"   Edit prompt: {edit_prompt}")
-        
-        # OpenAI's edit API requires the image as a file object
-        with open(image_path, "rb") as image_file:
+        client = _get_openai_client()
+
+        log.info(f"🖼️ Editing image with OpenAI...")
+        log.info(f"   Edit prompt: {edit_prompt}")
+
+        # Validate mode/size locally before paying for an API round trip;
+        # any needed conversion happens in memory, not via a temp file
+        with _prepare_image_for_edit(image_path) as image_file:
             response = client.images.edit(
-                model="gpt-image-1",
+                model=model,
                 image=image_file,
                 prompt=edit_prompt,
                 background="transparent",
@@ -94,33 +165,41 @@ def _edit_with_openai(image_path, edit_prompt, output_path):
         # Get the edited image
         if response.data and len(response.data) > 0:
             if hasattr(response.data[0], 'b64_json') and response.data[0].b64_json:
-                # Base64 response
+                # Base64 response - stream the decode straight into the output
+                # file instead of materializing the full decoded payload
                 image_b64 = response.data[0].b64_json
-                image_bytes = base64.b64decode(image_b64)
-                
-                # Save edited image
                 with open(output_path, 'wb') as f:
-                    f.write(image_bytes)
-                
-                print(f"✅ Image edited and saved to: {output_path}")
+                    base64.decode(BytesIO(image_b64.encode('ascii')), f)
+
+                # Guard against truncated/corrupt responses producing a broken file
+                verify_png_file(output_path)
+
+                log.info(f"✅ Image edited and saved to: {output_path}")
                 return output_path
             elif hasattr(response.data[0], 'url') and response.data[0].url:
-                # URL response
-                import requests
+                # URL response - stream the body to disk in chunks rather
+                # than buffering the whole download in memory
                 image_url = response.data[0].url
-                image_response = requests.get(image_url)
-                
-                if image_response.status_code == 200:
-                    with open(output_path, 'wb') as f:
-                        f.write(image_response.content)
-                    
-                    print(f"✅ Image edited and saved to: {output_path}")
-                    return output_path
+                image_response = _session.get(image_url, stream=True, timeout=30)
+                image_response.raise_for_status()
+
+                with open(output_path, 'wb') as f:
+                    shutil.copyfileobj(image_response.raw, f)
+
+                log.info(f"✅ Image edited and saved to: {output_path}")
+                return output_path
         
-        print("❌ No image returned from OpenAI edit")
+        log.error("❌ No image returned from OpenAI edit")
         return None
         
     except Exception as e:
-        print(f"❌ Error editing image with OpenAI: {e}")
+        log.error(f"❌ Error editing image with OpenAI: {e}")
         return None
 
+
+# Model → handler dispatch table; adding a provider only needs a new entry here
+_EDIT_DISPATCH = {
+    "gemini-3-pro-image-preview": _edit_with_gemini,
+    "gpt-image-1": _edit_with_openai,
+}
+
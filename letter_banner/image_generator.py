@@ -3,8 +3,23 @@ Model abstraction layer for image generation
 Routes requests to appropriate provider (OpenAI or Gemini) based on model selection
 """
 
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import cache
+from . import config
+from .utils import ensure_banner_output_dir, safe_object_name
 from .openai_client import generate_stylized_letter as generate_stylized_letter_openai
-from .gemini_client import generate_stylized_letter_gemini
+from .gemini_client import generate_stylized_letter_gemini, generate_stylized_letters_batch
+
+# Model → handler dispatch table; adding a provider only needs a new entry here
+_GEN_DISPATCH = {
+    "gemini-3-pro-image-preview": generate_stylized_letter_gemini,
+    "gpt-image-1": generate_stylized_letter_openai,
+}
+
+log = logging.getLogger(__name__)
 
 
 def generate_stylized_letter(letter, object_description, output_dir, run_timestamp, color_palette=None, model="gemini-3-pro-image-preview"):
@@ -22,22 +37,103 @@ def generate_stylized_letter(letter, object_description, output_dir, run_timesta
     Returns:
         str: Path to the generated letter image, or None if failed
     """
-    if model == "gemini-3-pro-image-preview":
-        return generate_stylized_letter_gemini(
+    handler = _GEN_DISPATCH.get(model)
+    if handler is None:
+        raise ValueError(f"Unsupported model: {model}. Supported models are: {', '.join(_GEN_DISPATCH)}")
+
+    # Identical request already generated (e.g. re-run after a partial
+    # failure, or another job in flight)? Reuse it and skip the paid API
+    # call entirely. The per-key lock makes this single-flight: concurrent
+    # requests for the same letter coalesce onto one generation.
+    key = cache.cache_key(letter, object_description, color_palette, model)
+    with cache.key_lock(key):
+        cached_path = cache.lookup(output_dir, key)
+        if cached_path:
+            dest_dir = ensure_banner_output_dir(output_dir, run_timestamp)
+            dest_path = os.path.join(
+                dest_dir,
+                f"letter_{letter.upper()}_{safe_object_name(object_description)}_{run_timestamp}.png"
+            )
+            return cache.materialize(cached_path, dest_path)
+
+        letter_path = handler(
             letter=letter,
             object_description=object_description,
             output_dir=output_dir,
             run_timestamp=run_timestamp,
             color_palette=color_palette
         )
-    elif model == "gpt-image-1":
-        return generate_stylized_letter_openai(
-            letter=letter,
-            object_description=object_description,
+        if letter_path:
+            cache.store(output_dir, key, letter_path)
+    return letter_path
+
+
+def generate_letters_concurrent(letters_and_objects, output_dir, run_timestamp, color_palette=None, model="gemini-3-pro-image-preview", mode="sync"):
+    """
+    Generate several stylized letters concurrently with a bounded thread pool.
+
+    Letter generation is network-bound (each API call takes several seconds),
+    so running the calls in parallel collapses N sequential waits into
+    roughly ceil(N / workers) waits. The worker count is capped by
+    config.MAX_CONCURRENT_REQUESTS to stay within provider rate limits.
+
+    Args:
+        letters_and_objects (list): List of (letter, object_description) tuples
+        output_dir (str): Output directory
+        run_timestamp (str): Timestamp for this run
+        color_palette (dict): Color palette to use for consistent styling
+        model (str): Model to use - "gemini-3-pro-image-preview" or "gpt-image-1"
+        mode (str): "sync" for live per-letter calls (default), or "batch" to
+            submit all letters as one Gemini Batch Mode job — roughly half the
+            cost, but results can take up to 24 hours
+
+    Returns:
+        list: Paths to the generated letter images, in input order
+              (None entries for letters that failed)
+    """
+    if not letters_and_objects:
+        return []
+
+    if mode == "batch":
+        if model != "gemini-3-pro-image-preview":
+            raise ValueError(f"Batch mode is only supported for 'gemini-3-pro-image-preview', not {model!r}")
+        return generate_stylized_letters_batch(
+            letters_and_objects=letters_and_objects,
             output_dir=output_dir,
             run_timestamp=run_timestamp,
             color_palette=color_palette
         )
-    else:
-        raise ValueError(f"Unsupported model: {model}. Supported models are 'gemini-3-pro-image' and 'gpt-image-1'")
+    elif mode != "sync":
+        raise ValueError(f"Unsupported mode: {mode}. Supported modes are 'sync' and 'batch'")
+
+    max_workers = min(len(letters_and_objects), config.MAX_CONCURRENT_REQUESTS)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        future_letters = {
+            pool.submit(
+                generate_stylized_letter,
+                letter,
+                object_description,
+                output_dir,
+                run_timestamp,
+                color_palette,
+                model
+            ): letter
+            for letter, object_description in letters_and_objects
+        }
+        # Stream progress as letters finish rather than waiting for all of
+        # them. Failures become None entries (per the contract above) so
+        # one bad letter doesn't throw away every successful one.
+        results = {}
+        completed = 0
+        for future in as_completed(future_letters):
+            completed += 1
+            letter = future_letters[future].upper()
+            if future.exception() is None:
+                results[future] = future.result()
+                log.info(f"✅ Letter '{letter}' finished ({completed}/{len(future_letters)})")
+            else:
+                results[future] = None
+                log.error(f"❌ Letter '{letter}' failed ({completed}/{len(future_letters)}): {future.exception()}")
+        return [results[future] for future in future_letters]
 
@@ -3,6 +3,8 @@ Banner layout utilities for letter banner generation
 """
 
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter as letter_size
@@ -10,6 +12,84 @@ from reportlab.lib.utils import ImageReader
 
 from . import config
 
+# Pillow-SIMD is a drop-in Pillow replacement with vectorized resampling; it
+# identifies itself with a ".postN" version suffix (e.g. "9.0.0.post1")
+if 'post' in getattr(Image, '__version__', ''):
+    print(f"⚡ Pillow-SIMD detected ({Image.__version__}) — resize kernels are vectorized")
+
+
+def _existing_paths(paths):
+    """
+    Return the subset of paths that exist, using one scandir per directory.
+
+    Letter images all live in the same run directory, so one directory
+    listing replaces a stat syscall per letter.
+    """
+    listings = {}
+    existing = set()
+    for path in paths:
+        dirname = os.path.dirname(path) or '.'
+        if dirname not in listings:
+            try:
+                with os.scandir(dirname) as it:
+                    listings[dirname] = {entry.name for entry in it}
+            except OSError:
+                listings[dirname] = set()
+        if os.path.basename(path) in listings[dirname]:
+            existing.add(path)
+    return existing
+
+
+def _flatten_to_white(img):
+    """
+    Composite any transparency onto an opaque white background.
+
+    Done before resampling so LANCZOS convolves 3 channels instead of 4 and
+    the banner paste needs no per-pixel mask blend afterwards.
+    """
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        white_bg = Image.new('RGB', img.size, 'white')
+        white_bg.paste(img, mask=img.split()[-1])
+        return white_bg
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def _resize_letter(letter_img, letter_size):
+    """
+    Downscale a letter image to letter_size x letter_size.
+
+    LANCZOS cost scales with input size, so a cheap BOX pre-pass down to 2x
+    the target (plus JPEG draft-mode decoding when the source is a JPEG)
+    does most of the shrinking first; the final LANCZOS pass over the small
+    intermediate keeps quality visually identical at a fraction of the
+    kernel work.
+
+    At 4x downscale or more, BOX averages 16+ source pixels per output
+    pixel and is indistinguishable from LANCZOS at print size, so skip the
+    LANCZOS pass entirely for those ratios.
+    """
+    if letter_img.format == 'JPEG':
+        letter_img.draft('RGB', (letter_size * 2, letter_size * 2))
+    if letter_img.width >= letter_size * 4 and letter_img.height >= letter_size * 4:
+        return letter_img.resize((letter_size, letter_size), Image.Resampling.BOX)
+    if letter_img.width > letter_size * 2 and letter_img.height > letter_size * 2:
+        letter_img = letter_img.resize(
+            (letter_size * 2, letter_size * 2), Image.Resampling.BOX
+        )
+    return letter_img.resize((letter_size, letter_size), Image.Resampling.LANCZOS)
+
+
+def _auto_letters_per_row(num_letters):
+    """Default grid width: full row up to 4 letters, then 4, capped at 6."""
+    if num_letters <= 4:
+        return num_letters
+    if num_letters <= 8:
+        return 4
+    return min(6, num_letters)
+
 
 def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_row=None):
     """
@@ -29,11 +109,14 @@ def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_ro
         return None
     
     try:
-        # Load all letter images
+        # Load all letter images eagerly up front — Image.open is lazy, so
+        # without .load() the file reads would interleave with the paste loop
+        existing = _existing_paths(letter_paths)
         letter_images = []
         for path in letter_paths:
-            if os.path.exists(path):
+            if path in existing:
                 img = Image.open(path)
+                img.load()
                 letter_images.append(img)
         
         if not letter_images:
@@ -44,13 +127,8 @@ def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_ro
         
         # Auto-calculate layout if not specified
         if letters_per_row is None:
-            if num_letters <= 4:
-                letters_per_row = num_letters
-            elif num_letters <= 8:
-                letters_per_row = 4
-            else:
-                letters_per_row = min(6, num_letters)
-        
+            letters_per_row = _auto_letters_per_row(num_letters)
+
         rows = (num_letters + letters_per_row - 1) // letters_per_row
         
         # Calculate letter size for the layout
@@ -66,18 +144,30 @@ def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_ro
         
         print(f"Creating banner layout: {letters_per_row} letters per row, {rows} rows")
         print(f"Letter size: {letter_size}x{letter_size} pixels")
-        
+
+        # Allocate only the rows actually used (capped at full page height):
+        # short names then skip 40-70% of the canvas RAM and the zlib encode
+        # over blank white. The embedded 300dpi means printers still place it
+        # correctly on the page.
+        banner_height = min(config.PRINT_HEIGHT_PIXELS, (2 * margin) + (rows * letter_size))
+
         # Create banner canvas
-        banner = Image.new('RGB', (config.PRINT_WIDTH_PIXELS, config.PRINT_HEIGHT_PIXELS), 'white')
+        banner = Image.new('RGB', (config.PRINT_WIDTH_PIXELS, banner_height), 'white')
         
+        # Flatten + resize all letters in parallel: Pillow releases the GIL
+        # inside its C resampling loop, so a small thread pool overlaps the
+        # convolution work across cores before the (serial) paste pass
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            resized_letters = list(pool.map(
+                lambda img: _resize_letter(_flatten_to_white(img), letter_size),
+                letter_images
+            ))
+
         # Place letters on the banner
-        for i, letter_img in enumerate(letter_images):
+        for i, letter_resized in enumerate(resized_letters):
             row = i // letters_per_row
             col = i % letters_per_row
-            
-            # Resize letter to fit
-            letter_resized = letter_img.resize((letter_size, letter_size), Image.Resampling.LANCZOS)
-            
+
             # Calculate position (centered within available space)
             total_row_width = letters_per_row * letter_size
             start_x = (config.PRINT_WIDTH_PIXELS - total_row_width) // 2
@@ -86,22 +176,21 @@ def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_ro
             x = start_x + (col * letter_size)
             y = start_y
             
-            # Handle transparent images properly
-            if letter_resized.mode in ('RGBA', 'LA') or (letter_resized.mode == 'P' and 'transparency' in letter_resized.info):
-                # Use alpha channel for proper transparency blending
-                banner.paste(letter_resized, (x, y), letter_resized)
-            else:
-                banner.paste(letter_resized, (x, y))
+            # Letters are opaque RGB after flattening — plain paste, no mask
+            banner.paste(letter_resized, (x, y))
         
         # Save banner
         banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
         banner_filename = f"printable_banner_{run_timestamp}.png"
         banner_path = os.path.join(banner_output_dir, banner_filename)
         
-        banner.save(banner_path, 'PNG', dpi=(300, 300))
+        # compress_level=1 is ~4x faster than the zlib default for a banner
+        # this size; the file is a rendered artifact, not archival, so the
+        # modestly larger output is a fine trade
+        banner.save(banner_path, 'PNG', dpi=(300, 300), compress_level=1)
         
         print(f"🖨️ Printable banner created: {banner_filename}")
-        print(f"📐 Dimensions: {config.PRINT_WIDTH_PIXELS}x{config.PRINT_HEIGHT_PIXELS} pixels (8.5x11 inches at 300dpi)")
+        print(f"📐 Dimensions: {config.PRINT_WIDTH_PIXELS}x{banner_height} pixels (8.5 inches wide at 300dpi)")
         
         return banner_path
         
@@ -110,6 +199,233 @@ def create_banner_layout(letter_paths, output_dir, run_timestamp, letters_per_ro
         return None
 
 
+def create_banner_pdf(letter_paths, output_dir, run_timestamp, letters_per_row=None):
+    """
+    Create a single-page banner PDF directly from the letter images.
+
+    Unlike create_banner_layout, this never materializes the full 300dpi
+    canvas: ReportLab embeds each letter's compressed PNG stream as-is and
+    the grid placement is just a few drawImage calls, so the 25-megapixel
+    allocate/resize/encode of the raster path is skipped entirely.
+
+    Args:
+        letter_paths (list): Paths to individual letter images
+        output_dir (str): Output directory
+        run_timestamp (str): Timestamp for this run
+        letters_per_row (int): Number of letters per row (auto-calculate if None)
+
+    Returns:
+        str: Path to the banner PDF file
+    """
+    if not letter_paths:
+        print("No letter images to create banner PDF from.")
+        return None
+
+    try:
+        existing = _existing_paths(letter_paths)
+        letter_paths = [p for p in letter_paths if p in existing]
+        if not letter_paths:
+            print("No valid letter images found for banner PDF creation.")
+            return None
+
+        num_letters = len(letter_paths)
+
+        # Same auto-layout rules as the raster banner
+        if letters_per_row is None:
+            letters_per_row = _auto_letters_per_row(num_letters)
+
+        rows = (num_letters + letters_per_row - 1) // letters_per_row
+
+        page_width, page_height = letter_size
+        margin = 36  # 0.5 inch margin in points
+        available_width = page_width - (2 * margin)
+        available_height = page_height - (2 * margin)
+
+        # Square cells, sized so the grid fits both dimensions
+        cell_size = min(available_width / letters_per_row, available_height / rows)
+
+        banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
+        os.makedirs(banner_output_dir, exist_ok=True)
+        pdf_filename = f"printable_banner_{run_timestamp}.pdf"
+        pdf_path = os.path.join(banner_output_dir, pdf_filename)
+
+        c = canvas.Canvas(pdf_path, pagesize=letter_size)
+
+        print(f"Creating banner PDF: {letters_per_row} letters per row, {rows} rows")
+
+        # One reader per unique file — ReportLab embeds the raster once and
+        # references it for every repeated letter
+        reader_cache = {}
+
+        total_row_width = letters_per_row * cell_size
+        start_x = (page_width - total_row_width) / 2
+        for i, letter_path in enumerate(letter_paths):
+            row = i // letters_per_row
+            col = i % letters_per_row
+
+            x = start_x + (col * cell_size)
+            # PDF origin is bottom-left; rows fill downward from the top
+            y = page_height - margin - ((row + 1) * cell_size)
+
+            real_path = os.path.realpath(letter_path)
+            if real_path not in reader_cache:
+                reader_cache[real_path] = ImageReader(letter_path)
+
+            # mask='auto' keeps transparent letter backgrounds transparent on
+            # the white page without flattening in Python
+            c.drawImage(
+                reader_cache[real_path], x, y,
+                width=cell_size, height=cell_size,
+                preserveAspectRatio=True, mask='auto'
+            )
+
+        c.save()
+
+        print(f"🖨️ Printable banner PDF created: {pdf_filename}")
+        return pdf_path
+
+    except Exception as e:
+        print(f"Error creating banner PDF: {e}")
+        return None
+
+
+class BannerAssembler:
+    """
+    Compose the banner and letters PDF incrementally while letters generate.
+
+    The batch functions above do all their PIL/ReportLab work after the last
+    letter arrives, serialized behind the slowest API call. The assembler
+    moves the per-letter CPU work (decode, flatten, resize, ImageReader
+    prep) into the generation window: call add_letter() as each letter
+    lands, and finalize() only has the paste/save left to do.
+
+    Grid geometry is fixed from the expected letter count at construction.
+    If any letter fails, finalize() falls back to the batch functions so a
+    shorter name still gets a correctly-sized grid.
+    """
+
+    def __init__(self, expected_count, output_dir, run_timestamp, letters_per_row=None):
+        self.expected_count = expected_count
+        self.output_dir = output_dir
+        self.run_timestamp = run_timestamp
+
+        if letters_per_row is None:
+            letters_per_row = _auto_letters_per_row(expected_count)
+        self.letters_per_row = letters_per_row
+        self.rows = (expected_count + letters_per_row - 1) // letters_per_row
+
+        margin = 100
+        available_width = config.PRINT_WIDTH_PIXELS - (2 * margin)
+        available_height = config.PRINT_HEIGHT_PIXELS - (2 * margin)
+        self.letter_size = min(
+            available_width // letters_per_row, available_height // self.rows
+        )
+        self._margin = margin
+
+        banner_height = min(
+            config.PRINT_HEIGHT_PIXELS, (2 * margin) + (self.rows * self.letter_size)
+        )
+        self._banner = Image.new(
+            'RGB', (config.PRINT_WIDTH_PIXELS, banner_height), 'white'
+        )
+        # add_letter runs from worker threads; resize happens outside the
+        # lock, only the shared-canvas paste and cache writes are guarded
+        self._lock = threading.Lock()
+        self._added = {}       # index -> letter_path
+        self._pdf_readers = {} # realpath -> (ImageReader, width, height)
+        self._failed = False
+
+    def add_letter(self, index, letter_path):
+        """Process one finished letter into the banner canvas and PDF cache."""
+        try:
+            with Image.open(letter_path) as img:
+                img.load()
+                width, height = img.size
+                flattened = _flatten_to_white(img)
+
+            resized = _resize_letter(flattened, self.letter_size)
+
+            row = index // self.letters_per_row
+            col = index % self.letters_per_row
+            total_row_width = self.letters_per_row * self.letter_size
+            x = ((config.PRINT_WIDTH_PIXELS - total_row_width) // 2) + (col * self.letter_size)
+            y = self._margin + (row * self.letter_size)
+
+            real_path = os.path.realpath(letter_path)
+            with self._lock:
+                self._banner.paste(resized, (x, y))
+                self._added[index] = letter_path
+                if real_path not in self._pdf_readers:
+                    # The flattened PIL image goes straight into ImageReader —
+                    # same trick as create_pdf_with_all_letters, minus the
+                    # second decode at PDF time
+                    self._pdf_readers[real_path] = (
+                        ImageReader(flattened), width, height
+                    )
+        except Exception as e:
+            print(f"⚠️ Incremental compose failed for {letter_path}: {e}")
+            with self._lock:
+                self._failed = True
+
+    def finalize(self, letter_paths, name="BANNER"):
+        """
+        Save the banner and write the PDF; returns (banner_path, pdf_path).
+
+        letter_paths is the final ordered list. When it matches what was
+        added incrementally, only the saves remain; otherwise (a letter
+        failed or came back different) the batch functions redo the work
+        with the correct final geometry.
+        """
+        added_in_order = [self._added.get(i) for i in sorted(self._added)]
+        if (
+            self._failed
+            or len(letter_paths) != self.expected_count
+            or added_in_order != list(letter_paths)
+        ):
+            banner_path = create_banner_layout(
+                letter_paths, self.output_dir, self.run_timestamp, None
+            )
+            pdf_path = create_pdf_with_all_letters(
+                letter_paths, self.output_dir, self.run_timestamp, name
+            )
+            return banner_path, pdf_path
+
+        banner_output_dir = os.path.join(
+            self.output_dir, f"letter_banner_{self.run_timestamp}"
+        )
+        os.makedirs(banner_output_dir, exist_ok=True)
+
+        banner_filename = f"printable_banner_{self.run_timestamp}.png"
+        banner_path = os.path.join(banner_output_dir, banner_filename)
+        self._banner.save(banner_path, 'PNG', dpi=(300, 300), compress_level=1)
+        print(f"🖨️ Printable banner created: {banner_filename}")
+
+        pdf_filename = f"{name.lower()}_letters_{self.run_timestamp}.pdf"
+        pdf_path = os.path.join(banner_output_dir, pdf_filename)
+        c = canvas.Canvas(pdf_path, pagesize=letter_size)
+        page_width, page_height = letter_size
+        margin = 36
+        available_width = page_width - (2 * margin)
+        available_height = page_height - (2 * margin)
+
+        for i, letter_path in enumerate(letter_paths):
+            img_reader, img_width, img_height = self._pdf_readers[
+                os.path.realpath(letter_path)
+            ]
+            scale = min(available_width / img_width, available_height / img_height)
+            final_width = img_width * scale
+            final_height = img_height * scale
+            x = (page_width - final_width) / 2
+            y = (page_height - final_height) / 2
+            c.drawImage(img_reader, x, y, width=final_width, height=final_height)
+            if i < len(letter_paths) - 1:
+                c.showPage()
+        c.save()
+        print(f"📄 PDF created with all letters: {pdf_filename}")
+
+        return banner_path, pdf_path
+
+
 def create_pdf_with_all_letters(letter_paths, output_dir, run_timestamp, name="BANNER"):
     """
     Create a PDF with all individual letters in order, one per page.
@@ -141,65 +457,70 @@ def create_pdf_with_all_letters(letter_paths, output_dir, run_timestamp, name="B
         page_width, page_height = letter_size
         
         print(f"Creating PDF with {len(letter_paths)} letters...")
-        
+
+        # One ImageReader per unique file, reused across pages — ReportLab
+        # dedupes by reader identity, so a name like "ANNA" embeds each
+        # repeated letter raster once and references it N times
+        reader_cache = {}
+
+        existing = _existing_paths(letter_paths)
         for i, letter_path in enumerate(letter_paths):
-            if not os.path.exists(letter_path):
+            if letter_path not in existing:
                 print(f"Warning: Letter image not found: {letter_path}")
                 continue
-            
+
             try:
-                # Open and process image for PDF
-                with Image.open(letter_path) as img:
-                    img_width, img_height = img.size
-                    
-                    # Calculate scaling to fit on page with margin
-                    margin = 36  # 0.5 inch margin (36 points = 0.5 inches)
-                    available_width = page_width - (2 * margin)
-                    available_height = page_height - (2 * margin)
-                    
-                    scale_w = available_width / img_width
-                    scale_h = available_height / img_height
-                    scale = min(scale_w, scale_h)  # Use smaller scale to fit
-                    
-                    # Calculate final dimensions and position
-                    final_width = img_width * scale
-                    final_height = img_height * scale
-                    x = (page_width - final_width) / 2
-                    y = (page_height - final_height) / 2
-                    
-                    # Handle transparency properly for PDF
-                    if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
-                        # For transparent images, create a temporary image with white background
-                        # This ensures the letter shows up clearly when printed
-                        white_bg = Image.new('RGB', img.size, 'white')
-                        if img.mode == 'RGBA':
-                            white_bg.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
+                real_path = os.path.realpath(letter_path)
+                if real_path in reader_cache:
+                    img_reader, img_width, img_height = reader_cache[real_path]
+                else:
+                    # Open and process image for PDF
+                    with Image.open(letter_path) as img:
+                        img_width, img_height = img.size
+
+                        # Handle transparency properly for PDF
+                        if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+                            # For transparent images, flatten onto white in memory
+                            # This ensures the letter shows up clearly when printed
+                            white_bg = Image.new('RGB', img.size, 'white')
+                            if img.mode == 'RGBA':
+                                white_bg.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
+                            else:
+                                white_bg.paste(img, (0, 0))
+
+                            # ImageReader accepts the PIL image directly — no temp
+                            # PNG encode/write/read/decode round trip per page
+                            img_reader = ImageReader(white_bg)
                         else:
-                            white_bg.paste(img, (0, 0))
-                        
-                        # Save temporary image
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                            white_bg.save(temp_file.name, 'PNG')
-                            temp_path = temp_file.name
-                        
-                        # Draw the processed image
-                        c.drawImage(temp_path, x, y, width=final_width, height=final_height)
-                        
-                        # Clean up temp file
-                        os.unlink(temp_path)
-                    else:
-                        # For non-transparent images, draw directly
-                        c.drawImage(letter_path, x, y, width=final_width, height=final_height)
-                    
-                    # Extract letter name for logging (but don't print on PDF)
-                    letter_name = os.path.basename(letter_path).split('_')[1]  # Extract letter from filename
-                    print(f"Added letter {letter_name.upper()} to PDF (page {i + 1})")
-                    
-                    # Start new page if not the last letter
-                    if i < len(letter_paths) - 1:
-                        c.showPage()
-                        
+                            # For non-transparent images, draw directly
+                            img_reader = ImageReader(letter_path)
+                    reader_cache[real_path] = (img_reader, img_width, img_height)
+
+                # Calculate scaling to fit on page with margin
+                margin = 36  # 0.5 inch margin (36 points = 0.5 inches)
+                available_width = page_width - (2 * margin)
+                available_height = page_height - (2 * margin)
+
+                scale_w = available_width / img_width
+                scale_h = available_height / img_height
+                scale = min(scale_w, scale_h)  # Use smaller scale to fit
+
+                # Calculate final dimensions and position
+                final_width = img_width * scale
+                final_height = img_height * scale
+                x = (page_width - final_width) / 2
+                y = (page_height - final_height) / 2
+
+                c.drawImage(img_reader, x, y, width=final_width, height=final_height)
+
+                # Extract letter name for logging (but don't print on PDF)
+                letter_name = os.path.basename(letter_path).split('_')[1]  # Extract letter from filename
+                print(f"Added letter {letter_name.upper()} to PDF (page {i + 1})")
+
+                # Start new page if not the last letter
+                if i < len(letter_paths) - 1:
+                    c.showPage()
+
             except Exception as e:
                 print(f"Error adding letter {letter_path} to PDF: {e}")
                 continue
@@ -0,0 +1,107 @@
+"""
+Persistent cache for LLM theme-variation responses.
+
+Identical (letters, theme, model) inputs always produce an equally good
+response, so repeat requests — dev-loop reruns, popular names — can be
+served from disk in under a millisecond instead of a ~2s LLM round trip.
+
+Entries live in a small sqlite database under ~/.cache/letter_banner and
+expire after a TTL. Cache failures are never allowed to break theme
+generation: any sqlite error degrades to a miss.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import functools
+import threading
+
+log = logging.getLogger(__name__)
+
+_DB_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "letter_banner", "themes.sqlite"
+)
+
+_lock = threading.Lock()
+_conn = None
+
+
+def cache_key(model, letters, theme):
+    """Deterministic key for a theme-variation request."""
+    canonical = json.dumps(
+        {"model": model, "letters": sorted(letters), "theme": theme.lower()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _get_conn():
+    """Open (once) the cache database, creating the schema if needed."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(_DB_PATH), exist_ok=True)
+        _conn = sqlite3.connect(_DB_PATH, check_same_thread=False)
+        # WAL lets concurrent readers proceed while a writer commits
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS themes ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def get(key, ttl):
+    """Return the cached variations for key, or None on miss/expiry."""
+    with _lock:
+        try:
+            row = _get_conn().execute(
+                "SELECT value, created_at FROM themes WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.warning(f"Theme cache read failed ({e}); treating as miss")
+            return None
+    if row is None:
+        return None
+    value, created_at = row
+    if time.time() - created_at > ttl:
+        return None
+    return json.loads(value)
+
+
+def set(key, variations):
+    """Store variations under key, replacing any stale entry."""
+    with _lock:
+        try:
+            conn = _get_conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO themes (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(variations), time.time()),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            log.warning(f"Theme cache write failed ({e}); response not cached")
+
+
+def cached(ttl=86400):
+    """
+    Decorator for `fn(letters, theme, model)` theme generators: serve
+    repeat inputs from the cache and store fresh successful responses.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(letters, theme, model="", **kwargs):
+            key = cache_key(model, letters, theme)
+            hit = get(key, ttl)
+            if hit is not None:
+                log.info(f"Theme cache hit for '{theme}' ({model})")
+                return hit
+            result = fn(letters, theme, model, **kwargs)
+            if result is not None:
+                set(key, result)
+            return result
+        return wrapper
+    return decorator
@@ -8,10 +8,23 @@ import base64
 from io import BytesIO
 from PIL import Image
 
+import openai
 from openai import OpenAI
 
 from . import config
+from .utils import PNG_SIGNATURE, ensure_banner_output_dir, safe_object_name, verify_png_file
 
+# Shared OpenAI client - constructed lazily once and reused so concurrent
+# letters share one authenticated connection pool (the SDK is thread-safe)
+_client = None
+
+
+def _get_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = OpenAI()
+    return _client
 
 
 def generate_stylized_letter(letter, object_description, output_dir, run_timestamp, color_palette=None):
@@ -57,8 +70,8 @@ def _generate_image_with_retry(prompt, output_dir, letter, object_description, r
     """
     Generate image with retry logic for moderation blocks.
     """
-    client = OpenAI()
-    
+    client = _get_client()
+
     # Retry logic for moderation blocks
     for retry_attempt in range(config.MAX_RETRIES_PER_LETTER):
         try:
@@ -83,33 +96,17 @@ def _generate_image_with_retry(prompt, output_dir, letter, object_description, r
             print(f"API request sent with background='white' for letter '{letter.upper()}'")
 
             if response.data and len(response.data) > 0:
-                # gpt-image-1 returns base64-encoded images directly
+                # gpt-image-1 always returns base64-encoded images inline, so
+                # there is never a second CDN round trip to fetch the bytes
                 if hasattr(response.data[0], 'b64_json') and response.data[0].b64_json:
                     image_b64 = response.data[0].b64_json
                     print(f"Base64 image data received for letter '{letter.upper()}'.")
                     image_bytes = base64.b64decode(image_b64)
-                    
+
                     # Save the generated image
                     return _save_generated_image(
                         image_bytes, letter, object_description, output_dir, run_timestamp
                     )
-                elif hasattr(response.data[0], 'url') and response.data[0].url:
-                    # Fallback for URL-based responses (DALL-E models)
-                    import requests
-                    image_url = response.data[0].url
-                    print(f"Image URL received for letter '{letter.upper()}'.")
-                    
-                    image_response = requests.get(image_url)
-                    if image_response.status_code == 200:
-                        image_bytes = image_response.content
-                        
-                        # Save the generated image
-                        return _save_generated_image(
-                            image_bytes, letter, object_description, output_dir, run_timestamp
-                        )
-                    else:
-                        print(f"❌ Failed to download image for letter '{letter.upper()}'")
-                        continue
                 else:
                     print(f"❌ No image data received for letter '{letter.upper()}'")
                     continue
@@ -117,22 +114,20 @@ def _generate_image_with_retry(prompt, output_dir, letter, object_description, r
                 print(f"❌ No response data received for letter '{letter.upper()}'")
                 continue
 
+        except openai.BadRequestError as e:
+            # The SDK raises a typed error with the API error code attached —
+            # no need to re-parse the response body to spot moderation blocks
+            if getattr(e, 'code', None) == 'moderation_blocked':
+                print(f"🚫 Letter '{letter.upper()}' blocked by moderation (attempt {retry_attempt + 1}/{config.MAX_RETRIES_PER_LETTER})")
+                if retry_attempt < config.MAX_RETRIES_PER_LETTER - 1:
+                    print(f"   Will retry in {config.RETRY_DELAY_SECONDS} seconds...")
+                    continue  # Try again
+                print(f"   Max retries exceeded for letter '{letter.upper()}'")
+                return None
+
+            print(f"❌ Error generating letter '{letter.upper()}': {e}")
+            return None
         except Exception as e:
-            # Check if this is a moderation error
-            if hasattr(e, 'response') and hasattr(e.response, 'json'):
-                try:
-                    error_data = e.response.json()
-                    if error_data.get('error', {}).get('code') == 'moderation_blocked':
-                        print(f"🚫 Letter '{letter.upper()}' blocked by moderation (attempt {retry_attempt + 1}/{config.MAX_RETRIES_PER_LETTER})")
-                        if retry_attempt < config.MAX_RETRIES_PER_LETTER - 1:
-                            print(f"   Will retry in {config.RETRY_DELAY_SECONDS} seconds...")
-                            continue  # Try again
-                        else:
-                            print(f"   Max retries exceeded for letter '{letter.upper()}'")
-                            return None
-                except:
-                    pass
-            
             print(f"❌ Error generating letter '{letter.upper()}': {e}")
             return None
     
@@ -142,32 +137,38 @@ def _generate_image_with_retry(prompt, output_dir, letter, object_description, r
 
 
 
+def _letter_output_path(letter, object_description, output_dir, run_timestamp):
+    """Destination path for a generated letter image."""
+    # Output directory creation is memoized — one mkdir per run, not per letter
+    banner_output_dir = ensure_banner_output_dir(output_dir, run_timestamp)
+    letter_basename = f"letter_{letter.upper()}_{safe_object_name(object_description)}"
+    return os.path.join(banner_output_dir, f"{letter_basename}_{run_timestamp}.png")
+
+
 def _save_generated_image(image_bytes, letter, object_description, output_dir, run_timestamp):
     """Save the generated image with appropriate naming."""
-    import shutil
-    
-    # Create output directory
-    banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
-    os.makedirs(banner_output_dir, exist_ok=True)
-    
-    # Create filename
-    letter_basename = f"letter_{letter.upper()}_{object_description.replace(' ', '_').replace(',', '')}"
-    new_letter_name = f"{letter_basename}_{run_timestamp}.png"
-    new_letter_path = os.path.join(banner_output_dir, new_letter_name)
-    
-    # Save image and check transparency
-    img_from_bytes = Image.open(BytesIO(image_bytes))
-    
-    # Debug: Check if image has transparency
-    has_transparency = img_from_bytes.mode in ('RGBA', 'LA') or 'transparency' in img_from_bytes.info
-    print(f"🔍 Image mode: {img_from_bytes.mode}, Has transparency: {has_transparency}")
+    new_letter_path = _letter_output_path(letter, object_description, output_dir, run_timestamp)
+    new_letter_name = os.path.basename(new_letter_path)
     
-    # Ensure we save with transparency if available
-    if has_transparency:
-        img_from_bytes.save(new_letter_path, format="PNG", optimize=True)
+    if image_bytes.startswith(PNG_SIGNATURE):
+        # The API already returned a valid PNG — write the bytes straight to
+        # disk with no decode/re-encode round trip
+        with open(new_letter_path, 'wb') as f:
+            f.write(image_bytes)
     else:
-        print(f"⚠️ Warning: Letter '{letter.upper()}' does not have transparency!")
+        # Fallback: decode with PIL and re-encode as PNG
+        img_from_bytes = Image.open(BytesIO(image_bytes))
+
+        # Debug: Check if image has transparency
+        has_transparency = img_from_bytes.mode in ('RGBA', 'LA') or 'transparency' in img_from_bytes.info
+        print(f"🔍 Image mode: {img_from_bytes.mode}, Has transparency: {has_transparency}")
+
+        if not has_transparency:
+            print(f"⚠️ Warning: Letter '{letter.upper()}' does not have transparency!")
         img_from_bytes.save(new_letter_path, format="PNG")
-    
+
+    # Guard against truncated/corrupt responses producing a broken file
+    verify_png_file(new_letter_path)
+
     print(f"✅ Letter '{letter.upper()}' saved: {new_letter_name}")
     return new_letter_path
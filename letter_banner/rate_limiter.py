@@ -0,0 +1,103 @@
+"""
+Thread-safe rate limiting for outbound API calls
+Keeps concurrent letter generation just under provider RPM quotas so we
+never trigger 429 storms and their expensive backoff cycles
+"""
+
+import time
+import threading
+
+from . import config
+
+
+class TokenBucket:
+    """
+    Classic token bucket: tokens refill continuously at rate_per_minute and
+    each API call consumes one. Calls block (rather than fail) when the
+    bucket is empty, so a burst of concurrent letters smooths out into a
+    steady stream the provider will accept.
+
+    Usable as a context manager:
+
+        with gemini_rate_limiter:
+            client.models.generate_content(...)
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.last_refill) * self.rate_per_second
+                )
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class CircuitBreaker:
+    """
+    Minimal circuit breaker: after failure_threshold consecutive failures
+    the circuit opens and allow() returns False until recovery_seconds have
+    passed, at which point one probe call is let through (half-open). A
+    success closes the circuit again.
+
+    Fails fast against a dead provider instead of burning a full timeout
+    per request while it is down.
+    """
+
+    def __init__(self, failure_threshold=3, recovery_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may proceed (circuit closed or half-open probe)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.recovery_seconds:
+                # Half-open: let one probe through; failure re-opens the clock
+                return True
+            return False
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        """Count a failure, opening the circuit at the threshold."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# Shared bucket for Gemini image generation - all threads throttle together
+gemini_rate_limiter = TokenBucket(
+    rate_per_minute=config.REQUESTS_PER_MINUTE,
+    burst=config.MAX_CONCURRENT_REQUESTS
+)
@@ -4,39 +4,93 @@ Generates creative letter-specific themes from a single overarching theme
 """
 
 import os
+import re
 import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+import openai
 from openai import OpenAI
 from google import genai
+from google.genai import errors as genai_errors
+from pydantic import BaseModel
 
+from . import llm_cache
+from .rate_limiter import CircuitBreaker
 
-def generate_theme_variations(name, theme, model="gemini-2.0-flash-exp"):
-    """
-    Generate creative theme variations for each letter in a name.
-    
-    Args:
-        name (str): The name/word to generate themes for
-        theme (str): The overarching theme (e.g., "mermaids", "space", "nature")
-        model (str): Model to use - "gemini-2.0-flash-exp" or "gpt-4o"
-    
-    Returns:
-        list: List of dicts with 'letter' and 'theme' keys, or None if failed
-    """
-    # Extract unique letters while preserving order
-    letters = [c.upper() for c in name if c.isalpha()]
-    
-    if model.startswith("gemini"):
-        return _generate_variations_gemini(letters, theme, model)
-    elif model.startswith("gpt"):
-        return _generate_variations_openai(letters, theme, model)
-    else:
-        raise ValueError(f"Unsupported model: {model}")
+# Letter extraction runs in C via a precompiled regex instead of a
+# per-character Python loop over str.isalpha
+_NON_ALPHA = re.compile(r"[^A-Za-z]")
 
 
-def _generate_variations_gemini(letters, theme, model="gemini-2.0-flash-exp"):
-    """Generate theme variations using Gemini."""
-    client = genai.Client()
-    
-    prompt = f"""For the letters {', '.join(letters)}, generate creative and specific theme variations based on the overarching theme '{theme}'.
+def _letters_of(name):
+    """Uppercase letters of name, in order, non-letters stripped."""
+    return list(_NON_ALPHA.sub("", name).upper())
+
+
+class Variation(BaseModel):
+    """One letter's theme, as returned by the structured-output call."""
+    letter: str
+    theme: str
+    # Fused in the same call: a ready-to-use image prompt costs one schema
+    # line here versus a whole second LLM round trip per letter
+    image_prompt: str = ""
+
+
+class Variations(BaseModel):
+    """Response schema for the OpenAI structured-output theme call."""
+    variations: list[Variation]
+
+
+# Retry policy for transient provider errors (429s, timeouts, 5xx)
+_MAX_ATTEMPTS = 3
+
+# Gemini error codes that retrying cannot fix (bad request/auth/model)
+_NON_RETRIABLE_CODES = {400, 401, 403, 404}
+
+# Per-provider breakers: a provider that has failed repeatedly fails fast
+# for 30s instead of costing every request a full retry cycle
+_gemini_breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=30.0)
+_openai_breaker = CircuitBreaker(failure_threshold=3, recovery_seconds=30.0)
+
+
+# Shared provider clients - constructed lazily once and reused so the
+# underlying httpx connection pools (and their TLS handshakes) persist
+# across theme requests instead of being rebuilt per call
+_openai_client = None
+_gemini_client = None
+
+
+def _get_openai():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI()
+    return _openai_client
+
+
+def _get_gemini():
+    """Return the shared Gemini client, creating it on first use."""
+    global _gemini_client
+    if _gemini_client is None:
+        _gemini_client = genai.Client()
+    return _gemini_client
+
+
+def _backoff_sleep(attempt, retry_after=None):
+    """Jittered exponential backoff, honoring a server-provided Retry-After."""
+    if retry_after:
+        try:
+            time.sleep(min(float(retry_after), 30))
+            return
+        except ValueError:
+            pass
+    time.sleep(min(2 ** attempt + random.random(), 30))
+
+# Shared prompt body, built once at import — both providers send the same
+# instructions, so the template lives here instead of being duplicated (and
+# re-evaluated as a 40-line f-string) inside each provider function
+_PROMPT_TEMPLATE = """For the letters {letters_csv}, generate creative and specific theme variations based on the overarching theme '{theme}'.
 
 CRITICAL INSTRUCTION: DO NOT make the theme start with the same letter! This is a common mistake to avoid.
 
@@ -51,130 +105,431 @@ Each letter should have a unique object, concept, or element related to {theme}.
 Make them diverse, interesting, and visually distinctive.
 Deliberately choose variations that DON'T start with the letter they're assigned to.
 
+For each letter also write "image_prompt": a short, ready-to-use image-generation prompt describing the decorative letter (shape, motifs, style).
+
 Return ONLY a valid JSON array:
 [
-  {{"letter": "{letters[0]}", "theme": "specific variation"}},
-  {{"letter": "{letters[1]}", "theme": "specific variation"}},
+  {{"letter": "{first_letter}", "theme": "specific variation", "image_prompt": "ready-to-use image prompt"}},
+  {{"letter": "{second_letter}", "theme": "specific variation", "image_prompt": "ready-to-use image prompt"}},
   ...
 ]
 
 Example for theme 'ocean' with letters A, B, C:
 [
-  {{"letter": "A", "theme": "coral reef"}},
-  {{"letter": "B", "theme": "treasure chest"}},
-  {{"letter": "C", "theme": "whale tail"}}
+  {{"letter": "A", "theme": "coral reef", "image_prompt": "the letter A built from vibrant coral branches and sea anemones"}},
+  {{"letter": "B", "theme": "treasure chest", "image_prompt": "the letter B formed from an open treasure chest spilling gold coins"}},
+  {{"letter": "C", "theme": "whale tail", "image_prompt": "the letter C curved like a breaching whale tail with sea spray"}}
 ]
 
-Now generate for {', '.join(letters)} with theme '{theme}'. Remember: themes should NOT start with their letter!"""
+Now generate for {letters_csv} with theme '{theme}'. Remember: themes should NOT start with their letter!"""
 
-    try:
-        print(f"🎨 Generating theme variations for '{theme}' with Gemini...")
-        
-        response = client.models.generate_content(
-            model=model,
-            contents=[prompt]
+
+def _build_prompt(letters, theme):
+    """Fill the shared prompt template for a set of letters and a theme."""
+    letters_csv = ", ".join(letters)
+    return _PROMPT_TEMPLATE.format(
+        letters_csv=letters_csv,
+        theme=theme,
+        first_letter=letters[0],
+        second_letter=letters[1] if len(letters) > 1 else letters[0],
+    )
+
+
+def generate_theme_variations(name, theme, model="gemini-2.0-flash-exp", max_batch=15):
+    """
+    Generate creative theme variations for each letter in a name.
+
+    This is the single batching entry point: all letters for a name go to
+    the LLM in one call (amortizing the shared instructions across the
+    whole batch) rather than one call per letter. Names longer than
+    max_batch are split into ceil(N/max_batch) calls and the results
+    concatenated — never into per-letter calls.
+
+    Args:
+        name (str): The name/word to generate themes for
+        theme (str): The overarching theme (e.g., "mermaids", "space", "nature")
+        model (str): Model to use - "gemini-2.0-flash-exp" or "gpt-4o"
+        max_batch (int): Maximum letters per LLM call
+
+    Returns:
+        list: List of dicts with 'letter' and 'theme' keys, or None if failed
+    """
+    all_letters = _letters_of(name)
+
+    # Only ask the LLM about unique letters — "BANANA" has 3, not 6 — and
+    # expand back to the full sequence afterwards. Halves tokens and
+    # latency for names with repeats.
+    seen = set()
+    letters = [c for c in all_letters if not (c in seen or seen.add(c))]
+
+    # Gate on which keys actually loaded: constructing a client without its
+    # key raises deep inside the SDK after network setup, so switch to the
+    # other provider up front instead
+    if model.startswith("gemini"):
+        if not os.getenv("GEMINI_API_KEY") and os.getenv("OPENAI_API_KEY"):
+            print("⚠️ No Gemini API key loaded — using OpenAI for theme variations")
+            model = "gpt-4o"
+            generate = _generate_variations_openai
+        else:
+            generate = _generate_variations_gemini
+    elif model.startswith("gpt"):
+        if not os.getenv("OPENAI_API_KEY") and os.getenv("GEMINI_API_KEY"):
+            print("⚠️ No OpenAI API key loaded — using Gemini for theme variations")
+            model = "gemini-2.0-flash-exp"
+            generate = _generate_variations_gemini
+        else:
+            generate = _generate_variations_openai
+    else:
+        raise ValueError(f"Unsupported model: {model}")
+
+    variations = []
+    for start in range(0, len(letters), max_batch):
+        batch = generate(letters[start:start + max_batch], theme, model)
+        if batch is None:
+            return None
+        variations.extend(batch)
+
+    # Re-expand duplicates by letter lookup; fall back to the bare theme if
+    # the model skipped a letter so the result always covers the whole name
+    by_letter = {v["letter"].upper(): v for v in variations if "letter" in v}
+    expanded = []
+    for letter in all_letters:
+        variation = by_letter.get(letter)
+        entry = {"letter": letter, "theme": variation["theme"] if variation else theme}
+        if variation and variation.get("image_prompt"):
+            entry["image_prompt"] = variation["image_prompt"]
+        expanded.append(entry)
+    return expanded
+
+
+_json_decoder = json.JSONDecoder()
+
+
+def _extract_complete_objects(buffer, pos):
+    """
+    Pull complete JSON objects out of a partially-received array.
+
+    Scans buffer from pos for '{' and raw-decodes from there; a decode
+    failure just means the object's tail hasn't streamed in yet. Returns
+    (objects, new_pos) so the caller can resume where parsing stopped.
+    """
+    objects = []
+    while True:
+        start = buffer.find('{', pos)
+        if start == -1:
+            return objects, len(buffer)
+        try:
+            obj, end = _json_decoder.raw_decode(buffer, start)
+        except json.JSONDecodeError:
+            return objects, start
+        objects.append(obj)
+        pos = end
+
+
+def stream_theme_variations(name, theme, model="gemini-2.0-flash-exp"):
+    """
+    Generate theme variations, yielding each one as the LLM produces it.
+
+    Instead of waiting for the full JSON array, the provider response is
+    streamed and complete {"letter", "theme"} objects are yielded as soon
+    as they close — so image generation for letter 1 can start while the
+    LLM is still writing letter N. Yields variations for unique letters
+    only; callers mapping a full name should fan repeats out by letter.
+
+    Args:
+        name (str): The name/word to generate themes for
+        theme (str): The overarching theme
+        model (str): Model to use - "gemini-2.0-flash-exp" or "gpt-4o"
+
+    Yields:
+        dict: {'letter': ..., 'theme': ...} as each variation completes
+    """
+    all_letters = _letters_of(name)
+    seen = set()
+    letters = [c for c in all_letters if not (c in seen or seen.add(c))]
+
+    prompt = _build_prompt(letters, theme)
+
+    if model.startswith("gemini"):
+        chunks = (
+            chunk.text or ""
+            for chunk in _get_gemini().models.generate_content_stream(
+                model=model,
+                contents=[prompt],
+                config=genai.types.GenerateContentConfig(
+                    response_mime_type="application/json"
+                )
+            )
         )
-        
-        # Extract text response
-        response_text = ""
-        for part in response.parts:
-            if part.text:
-                response_text = part.text
-                break
-        
-        # Parse JSON from response
-        # Remove markdown code blocks if present
-        response_text = response_text.strip()
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        variations = json.loads(response_text)
-        
-        print(f"✅ Generated {len(variations)} theme variations")
-        for v in variations:
-            print(f"   {v['letter']} → {v['theme']}")
-        
-        return variations
-        
-    except Exception as e:
-        print(f"❌ Error generating theme variations with Gemini: {e}")
-        return None
+    elif model.startswith("gpt"):
+        chunks = (
+            chunk.choices[0].delta.content or ""
+            for chunk in _get_openai().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True
+            )
+        )
+    else:
+        raise ValueError(f"Unsupported model: {model}")
 
+    buffer = ""
+    pos = 0
+    for text in chunks:
+        buffer += text
+        objects, pos = _extract_complete_objects(buffer, pos)
+        for obj in objects:
+            if isinstance(obj, dict) and "letter" in obj and "theme" in obj:
+                yield {"letter": str(obj["letter"]).upper(), "theme": obj["theme"]}
 
-def _generate_variations_openai(letters, theme, model="gpt-4o"):
-    """Generate theme variations using OpenAI."""
-    client = OpenAI()
-    
-    prompt = f"""For the letters {', '.join(letters)}, generate creative and specific theme variations based on the overarching theme '{theme}'.
 
-CRITICAL INSTRUCTION: DO NOT make the theme start with the same letter! This is a common mistake to avoid.
+def generate_theme_variations_many(names_and_themes, model="gemini-2.0-flash-exp", max_workers=10):
+    """
+    Generate theme variations for several (name, theme) pairs in parallel.
 
-For example, if the letter is 'H' and theme is 'Lord of the Rings':
-❌ WRONG: "Helm's Deep" (starts with H)
-❌ WRONG: "Hobbit" (starts with H)
-✅ CORRECT: "One Ring" (doesn't start with H)
-✅ CORRECT: "Mount Doom" (doesn't start with H)
-✅ CORRECT: "Elven cloak" (doesn't start with H)
+    Bounded by max_workers so bulk callers can't stampede the provider's
+    rate limit; each pair still goes through the batched single-call path
+    (and the cache) of generate_theme_variations.
 
-Each letter should have a unique object, concept, or element related to {theme}.
-Make them diverse, interesting, and visually distinctive.
-Deliberately choose variations that DON'T start with the letter they're assigned to.
+    Args:
+        names_and_themes (list): (name, theme) pairs
+        model (str): Model to use for every pair
+        max_workers (int): Maximum concurrent LLM calls
 
-Return ONLY a valid JSON array:
-[
-  {{"letter": "{letters[0]}", "theme": "specific variation"}},
-  {{"letter": "{letters[1]}", "theme": "specific variation"}},
-  ...
-]
+    Returns:
+        list: Per-pair results in input order (None entries for failures)
+    """
+    if not names_and_themes:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(names_and_themes), max_workers)) as pool:
+        futures = [
+            pool.submit(generate_theme_variations, name, theme, model)
+            for name, theme in names_and_themes
+        ]
+        return [f.result() for f in futures]
 
-Example for theme 'ocean' with letters A, B, C:
-[
-  {{"letter": "A", "theme": "coral reef"}},
-  {{"letter": "B", "theme": "treasure chest"}},
-  {{"letter": "C", "theme": "whale tail"}}
-]
 
-Now generate for {', '.join(letters)} with theme '{theme}'. Remember: themes should NOT start with their letter!"""
+def generate_theme_variations_hedged(name, theme, hedge_delay=2.0):
+    """
+    Generate theme variations with a hedged request across providers.
+
+    Gemini is asked first; if it hasn't answered within hedge_delay
+    seconds, the same request is fired at OpenAI and whichever provider
+    responds first wins. A slow primary (occasional multi-second spikes)
+    then costs hedge_delay extra, not the full spike — and the second
+    call is only ever paid for when the primary is already slow.
 
+    Args:
+        name (str): The name/word to generate themes for
+        theme (str): The overarching theme
+        hedge_delay (float): Seconds to wait before firing the backup request
+
+    Returns:
+        list: List of dicts with 'letter' and 'theme' keys, or None if
+              both providers failed
+    """
+    # No context manager: exiting a `with` pool joins every worker, which
+    # would make the winner wait for the losing hedge thread — the exact
+    # tail latency this function exists to avoid. shutdown(wait=False)
+    # lets the loser finish (and warm the cache) in the background.
+    pool = ThreadPoolExecutor(max_workers=2)
     try:
-        print(f"🎨 Generating theme variations for '{theme}' with OpenAI...")
-        
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a creative assistant that generates theme variations for decorative letters. Always respond with valid JSON only. NEVER match the theme's first letter with the letter being designed."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
+        primary = pool.submit(generate_theme_variations, name, theme, "gemini-2.0-flash-exp")
+
+        done, _ = wait({primary}, timeout=hedge_delay)
+        if primary in done:
+            result = primary.result()
+            if result is not None:
+                return result
+            # Primary failed outright — go straight to the backup
+            return generate_theme_variations(name, theme, "gpt-4o")
+
+        print(f"⏳ Gemini slower than {hedge_delay}s — hedging with OpenAI...")
+        backup = pool.submit(generate_theme_variations, name, theme, "gpt-4o")
+
+        pending = {primary, backup}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                if result is not None:
+                    # The loser keeps running in its worker thread but its
+                    # result is simply dropped (and cached for next time)
+                    return result
+        return None
+    finally:
+        pool.shutdown(wait=False)
+
+
+# Provider chain for generate_theme_variations_with_fallback, tried in
+# order. The final "static" layer is deterministic and cannot fail, so the
+# banner always gets *some* per-letter theme rather than silently stalling.
+_FALLBACK_CHAIN = [
+    ("gemini", "gemini-2.0-flash-exp"),
+    ("openai", "gpt-4o-mini"),
+    ("static", None),
+]
+
+# Hard per-provider timeout: a hung call should cost seconds, not minutes
+_PROVIDER_TIMEOUT_SECONDS = 8.0
+
+
+def _static_theme_variations(letters, theme):
+    """Deterministic degraded-mode themes when every LLM provider is down."""
+    return [
+        {"letter": letter, "theme": f"{theme} element {i + 1}"}
+        for i, letter in enumerate(letters)
+    ]
+
+
+def generate_theme_variations_with_fallback(name, theme):
+    """
+    Generate theme variations through a primary → fallback → degraded chain.
+
+    Tries Gemini, then OpenAI, each under a hard timeout; if both fail or
+    time out, returns a deterministic static theme list so the banner
+    pipeline always has something to render instead of dying on None.
+
+    Args:
+        name (str): The name/word to generate themes for
+        theme (str): The overarching theme
+
+    Returns:
+        list: List of dicts with 'letter' and 'theme' keys (never None)
+    """
+    letters = _letters_of(name)
+
+    for provider, model in _FALLBACK_CHAIN:
+        if provider == "static":
+            print(f"⚠️ All LLM providers failed — using static '{theme}' themes")
+            return _static_theme_variations(letters, theme)
+
+        # No context manager: exiting one would join the worker, so a hung
+        # provider would block past its timeout anyway. shutdown(wait=False)
+        # lets the abandoned call finish (and be dropped) in the background.
+        pool = ThreadPoolExecutor(max_workers=1)
+        future = pool.submit(generate_theme_variations, name, theme, model)
+        try:
+            result = future.result(timeout=_PROVIDER_TIMEOUT_SECONDS)
+        except FutureTimeout:
+            print(f"⏰ {provider} timed out after {_PROVIDER_TIMEOUT_SECONDS}s — trying next provider")
+            continue
+        except Exception as e:
+            print(f"❌ {provider} failed ({e}) — trying next provider")
+            continue
+        finally:
+            pool.shutdown(wait=False)
+
+        if result is not None:
+            print(f"✅ Theme variations served by {provider} ({model})")
+            return result
+        print(f"❌ {provider} returned no variations — trying next provider")
+
+    # Unreachable: the static layer always returns
+    return _static_theme_variations(letters, theme)
+
+
+def _call_gemini(prompt, model):
+    """Single Gemini completion: JSON mode in, parsed variations out."""
+    # JSON mode: the model returns a bare JSON document, so no markdown
+    # fences to strip and no stray-prose parse failures
+    response = _get_gemini().models.generate_content(
+        model=model,
+        contents=[prompt],
+        config=genai.types.GenerateContentConfig(
+            response_mime_type="application/json"
         )
-        
-        response_text = response.choices[0].message.content
-        
-        # Parse JSON - OpenAI might wrap it
-        response_data = json.loads(response_text)
-        
-        # Handle different response formats
-        if "variations" in response_data:
-            variations = response_data["variations"]
-        elif "letters" in response_data:
-            variations = response_data["letters"]
-        elif isinstance(response_data, list):
-            variations = response_data
-        else:
-            # Try to find the array in the response
-            variations = next(v for v in response_data.values() if isinstance(v, list))
-        
-        print(f"✅ Generated {len(variations)} theme variations")
-        for v in variations:
-            print(f"   {v['letter']} → {v['theme']}")
-        
-        return variations
-        
-    except Exception as e:
-        print(f"❌ Error generating theme variations with OpenAI: {e}")
+    )
+    return json.loads(response.text)
+
+
+def _call_openai(prompt, model):
+    """Single OpenAI completion: structured outputs in, parsed variations out."""
+    # Structured outputs: the schema guarantees the response shape, so no
+    # guessing which key the model wrapped the array in
+    response = _get_openai().beta.chat.completions.parse(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are a creative assistant that generates theme variations for decorative letters. NEVER match the theme's first letter with the letter being designed."},
+            {"role": "user", "content": prompt}
+        ],
+        response_format=Variations
+    )
+    return [
+        {"letter": v.letter, "theme": v.theme, "image_prompt": v.image_prompt}
+        for v in response.choices[0].message.parsed.variations
+    ]
+
+
+def _classify_error(e):
+    """
+    Sort a provider exception into ('retry', retry_after) or ('fatal', None).
+
+    Transient trouble (429s, timeouts, connection drops, retriable Gemini
+    codes) is worth retrying; auth, bad-request, and parse failures never
+    fix themselves.
+    """
+    if isinstance(e, genai_errors.APIError):
+        if getattr(e, 'code', None) in _NON_RETRIABLE_CODES:
+            return 'fatal', None
+        return 'retry', None
+    if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        error_response = getattr(e, 'response', None)
+        retry_after = error_response.headers.get('Retry-After') if error_response is not None else None
+        return 'retry', retry_after
+    return 'fatal', None
+
+
+def _generate_variations(provider, call, breaker, letters, theme, model):
+    """
+    Shared provider skeleton: breaker gate, prompt build, retry loop, and
+    success logging live here exactly once. Only the SDK call and response
+    parse differ per provider, via the call adapter.
+    """
+    if not breaker.allow():
+        print(f"⛔ {provider} circuit open — failing fast")
         return None
+
+    prompt = _build_prompt(letters, theme)
+
+    for attempt in range(_MAX_ATTEMPTS):
+        try:
+            print(f"🎨 Generating theme variations for '{theme}' with {provider}...")
+
+            variations = call(prompt, model)
+
+            breaker.record_success()
+            # One write instead of N: each print is a syscall + flush
+            # under a log aggregator
+            print(f"✅ Generated {len(variations)} theme variations\n" + "\n".join(
+                f"   {v['letter']} → {v['theme']}" for v in variations
+            ))
+
+            return variations
+
+        except Exception as e:
+            action, retry_after = _classify_error(e)
+            if action == 'retry':
+                breaker.record_failure()
+                if attempt < _MAX_ATTEMPTS - 1:
+                    print(f"⚠️ Transient {provider} error ({e}); retrying ({attempt + 2}/{_MAX_ATTEMPTS})")
+                    _backoff_sleep(attempt, retry_after)
+                    continue
+                print(f"❌ {provider} still failing after {_MAX_ATTEMPTS} attempts: {e}")
+                return None
+            print(f"❌ Error generating theme variations with {provider}: {e}")
+            return None
+
+    return None
+
+
+@llm_cache.cached(ttl=86400)
+def _generate_variations_gemini(letters, theme, model="gemini-2.0-flash-exp"):
+    """Generate theme variations using Gemini."""
+    return _generate_variations("Gemini", _call_gemini, _gemini_breaker, letters, theme, model)
+
+
+@llm_cache.cached(ttl=86400)
+def _generate_variations_openai(letters, theme, model="gpt-4o"):
+    """Generate theme variations using OpenAI."""
+    return _generate_variations("OpenAI", _call_openai, _openai_breaker, letters, theme, model)
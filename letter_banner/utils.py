@@ -3,46 +3,160 @@ Utility functions for letter banner generation
 """
 
 import os
+import logging
+import logging.handlers
+import functools
 from dotenv import load_dotenv
 
+# First 8 bytes of every valid PNG file
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
+# .env lives in the project root (parent of this package), resolved once
+_DOTENV_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"
+)
+
+
+def verify_png_file(path):
+    """
+    Verify that a saved file starts with the PNG magic bytes.
+
+    A truncated or corrupt API response can otherwise produce a broken PNG
+    that only fails at print time. Raises ValueError on mismatch so callers
+    can treat it as a retriable failure.
+    """
+    with open(path, 'rb') as f:
+        signature = f.read(len(PNG_SIGNATURE))
+    if signature != PNG_SIGNATURE:
+        raise ValueError(f"Corrupt PNG written to {path} (bad signature)")
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Configure buffered logging for letter generation.
+
+    Generation logs many short lines per letter; a MemoryHandler batches
+    them and only flushes to stderr when the buffer fills or a WARNING
+    arrives, avoiding a synchronous stdout flush per line (which also
+    garbles interleaved output when letters are generated concurrently).
+    """
+    root = logging.getLogger("letter_banner")
+    if root.handlers:
+        return  # Already configured
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    buffered = logging.handlers.MemoryHandler(
+        capacity=64, flushLevel=logging.WARNING, target=stream_handler
+    )
+    root.addHandler(buffered)
+    root.setLevel(level)
+
+
+@functools.lru_cache(maxsize=32)
+def ensure_banner_output_dir(output_dir, run_timestamp):
+    """
+    Create (once) and return the banner output directory for a run.
+
+    Memoized so generating N letters costs one mkdir/stat instead of N —
+    every letter in a run shares the same (output_dir, run_timestamp) key.
+    """
+    banner_output_dir = os.path.join(output_dir, f"letter_banner_{run_timestamp}")
+    os.makedirs(banner_output_dir, exist_ok=True)
+    return banner_output_dir
+
+
+@functools.lru_cache(maxsize=32)
+def safe_object_name(object_description):
+    """Filename-safe form of an object description, memoized per description."""
+    return object_description.replace(' ', '_').replace(',', '')
+
+
+@functools.lru_cache(maxsize=1)
 def load_api_key():
-    """Load API keys from environment or .env file (OpenAI and/or Gemini)."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # Look for .env in the parent directory (project root)
-    project_root = os.path.dirname(script_dir)
-    dotenv_path = os.path.join(project_root, ".env")
-    
+    """
+    Load API keys from environment or .env file (OpenAI and/or Gemini).
+
+    Memoized: the .env file is read from disk once per process, not once
+    per caller. Tests that mutate the environment can reset with
+    load_api_key.cache_clear().
+
+    Returns:
+        dict: {"openai": bool, "gemini": bool} — which providers have keys.
+              Falsy handling still works: callers should check
+              any(keys.values()) to see if at least one key loaded.
+    """
     # Load from .env file if it exists, but DON'T override existing environment variables
     # This allows Replit Secrets (or other environment variables) to take precedence
-    loaded_successfully = load_dotenv(dotenv_path=dotenv_path, override=False)
-    
+    loaded_successfully = load_dotenv(dotenv_path=_DOTENV_PATH, override=False)
+
     if not loaded_successfully:
-        print(f"Info: No .env file found at {dotenv_path} (this is normal on Replit with Secrets)")
+        print(f"Info: No .env file found at {_DOTENV_PATH} (this is normal on Replit with Secrets)")
     
     # Check for API keys in environment
-    openai_key = os.getenv("OPENAI_API_KEY")
-    gemini_key = os.getenv("GEMINI_API_KEY")
-    
-    keys_found = []
-    if openai_key:
-        keys_found.append("OpenAI")
-    if gemini_key:
-        keys_found.append("Gemini")
-    
+    keys = {
+        "openai": bool(os.getenv("OPENAI_API_KEY")),
+        "gemini": bool(os.getenv("GEMINI_API_KEY")),
+    }
+
+    keys_found = [provider.capitalize() for provider, present in keys.items() if present]
+
     if not keys_found:
         print("Error: No API keys found.")
         print("For local development:")
-        print(f"  - Create '{dotenv_path}' with your API keys")
+        print(f"  - Create '{_DOTENV_PATH}' with your API keys")
         print("For Replit deployment:")
         print("  - Add keys to Replit Secrets (🔒 icon in sidebar)")
         print("Required keys (add at least one):")
         print("  - OPENAI_API_KEY")
         print("  - GEMINI_API_KEY")
-        return False
-    
+        return keys
+
     print(f"API keys loaded successfully: {', '.join(keys_found)}")
-    return True
+    return keys
+
+
+def parse_letter_spec(spec):
+    """
+    Parse a letter/object specification into (letter, object) tuples.
+
+    Pure parsing with no I/O, so the CLI, the web endpoints, and scripts
+    all share one code path. Accepts:
+      - "A=apple,B=bee" strings
+      - {"A": "apple", "B": "bee"} dicts
+      - [("A", "apple"), ...] sequences of pairs
+
+    Args:
+        spec (str | dict | list): Letter specification in any supported form
+
+    Returns:
+        list: List of (letter, object_description) tuples
+
+    Raises:
+        ValueError: If the spec (or any entry in it) is malformed
+    """
+    if isinstance(spec, dict):
+        pairs = spec.items()
+    elif isinstance(spec, str):
+        pairs = []
+        for entry in spec.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            if '=' not in entry:
+                raise ValueError(f"Invalid letter entry (expected LETTER=object): {entry!r}")
+            letter, object_desc = entry.split('=', 1)
+            pairs.append((letter, object_desc))
+    else:
+        pairs = list(spec)
+
+    letters_and_objects = []
+    for letter, object_desc in pairs:
+        letter = letter.strip().upper()
+        object_desc = object_desc.strip()
+        if len(letter) != 1 or not letter.isalpha() or not object_desc:
+            raise ValueError(f"Invalid letter entry: {letter!r} = {object_desc!r}")
+        letters_and_objects.append((letter, object_desc))
+    return letters_and_objects
 
 
 def interactive_letter_input():
@@ -77,25 +191,25 @@ def interactive_letter_input():
             if user_input.lower() in ['done', 'quit', 'exit']:
                 break
             
-            if '=' in user_input:
-                # Parse "A=apple" format
-                letter, object_desc = user_input.split('=', 1)
-                letter = letter.strip().upper()
-                object_desc = object_desc.strip()
-            else:
-                # Ask separately
+            if '=' not in user_input:
+                # Ask for the object separately, then normalize to one form
                 letter = user_input.upper()
                 if len(letter) != 1 or not letter.isalpha():
                     print("Please enter a single letter.")
                     continue
-                
+
                 object_desc = input(f"What should letter '{letter}' be shaped like? ").strip()
-            
-            if len(letter) == 1 and letter.isalpha() and object_desc:
+                user_input = f"{letter}={object_desc}"
+
+            try:
+                parsed = parse_letter_spec(user_input)
+            except ValueError:
+                print("Invalid input. Please try again.")
+                continue
+
+            for letter, object_desc in parsed:
                 letters_and_objects.append((letter, object_desc))
                 print(f"✅ Added: {letter} = {object_desc}")
-            else:
-                print("Invalid input. Please try again.")
                 
         except KeyboardInterrupt:
             print("\n\nExiting...")
@@ -3,20 +3,25 @@ FastAPI web application for Letter Banner Generator service
 """
 
 import os
+import re
 import uuid
 import asyncio
+import hashlib
+import heapq
 import json
 import shutil
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional, Any
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Form, File, UploadFile
+import orjson
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response, Form, File, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
-from pydantic import BaseModel, validator
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
 
 # Import our existing letter banner logic
 import sys
@@ -26,77 +31,142 @@ sys.path.insert(0, project_root)
 from letter_banner import config
 from letter_banner.color_palettes import COLOR_PALETTES
 from letter_banner.image_generator import generate_stylized_letter
-from letter_banner.layout import create_banner_layout, create_pdf_with_all_letters
-from letter_banner.utils import load_api_key
+from letter_banner.layout import create_pdf_with_all_letters, BannerAssembler
+from letter_banner.utils import load_api_key, setup_logging
 from letter_banner.theme_generator import generate_theme_variations
 from letter_banner.image_editor import edit_letter_image
+from web.job_store import JobStore, JobRecord
 
-# Initialize FastAPI app
+# Initialize FastAPI app. orjson responses skip the stdlib json encoder —
+# that's pure CPU saved on every response, and the status endpoint is
+# polled continuously by the frontend
 app = FastAPI(
     title="Letter Banner Generator",
     description="Create stylized letter banners where each letter is shaped like objects",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Mount static files and templates
 app.mount("/static", StaticFiles(directory="web/static"), name="static")
 templates = Jinja2Templates(directory="web/templates")
 
-# Global storage for job status and results
-jobs_storage: Dict[str, Dict[str, Any]] = {}
-executor = ThreadPoolExecutor(max_workers=10)  # Allow parallel letter generation
+# Global storage for job status and results. Dict-like in-process store,
+# mirrored to Redis when REDIS_URL is configured (see web/job_store.py) so
+# status reads survive restarts / extra workers.
+jobs_storage = JobStore()
+# Worker threads are cheap while blocked on provider I/O — the pool is
+# sized generously and the real concurrency limit is the semaphore below,
+# which tracks the API rate limit rather than a thread count
+executor = ThreadPoolExecutor(max_workers=32)
+api_semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+
+# CPU-bound PIL/ReportLab batch work goes to worker processes so PNG
+# encoding and rasterization never contend for the GIL with the API-call
+# threads above. Workers spawn lazily on first submit. Only top-level
+# functions taking file paths are routed here — nothing pickles an image
+process_executor = ProcessPoolExecutor(max_workers=2)
+
+# Matches the run timestamp embedded in generated filenames,
+# e.g. letter_A_20240101_120000.png
+_TIMESTAMP_RE = re.compile(r'_(\d{8}_\d{6})')
+
+# WebSocket subscribers per job: progress is pushed the moment a letter
+# finishes, so connected clients don't need the 1s polling loop
+_status_watchers: Dict[str, set] = {}
+
+
+def _status_snapshot(job):
+    """Small progress payload pushed to WebSocket subscribers."""
+    return {
+        "status": job["status"],
+        "progress": job["progress"],
+        "current_step": job["current_step"],
+        "completed_letters": job["completed_letters"],
+        "total_letters": job["total_letters"],
+    }
+
+
+def _push_status(job_id, job):
+    """Notify any WebSocket subscribers of this job's latest state."""
+    watchers = _status_watchers.get(job_id)
+    if not watchers:
+        return
+    snapshot = _status_snapshot(job)
+    for queue in watchers:
+        queue.put_nowait(snapshot)
 
 # Cleanup old jobs periodically
 CLEANUP_INTERVAL = 3600  # 1 hour
 MAX_JOB_AGE = 24 * 3600  # 24 hours
 
+# Min-heap of (expires_at, job_id): cleanup pops only the jobs that are
+# actually due instead of scanning the whole store every tick
+_expiry_heap = []
+
+# Pending + processing jobs, maintained at status transitions so /health
+# (hit by uptime probes every few seconds) never scans the job store
+active_jobs_count = 0
+
+# Frozen at import so validators do one set-membership test instead of
+# rebuilding option lists per request
+_VALID_PALETTES = frozenset(COLOR_PALETTES) | {"custom"}
+_VALID_MODELS = frozenset(config.SUPPORTED_MODELS)
+
 class LetterRequest(BaseModel):
+    # str_strip_whitespace strips string fields in Rust during parsing,
+    # replacing the manual .strip() validators the v1 models carried
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     letter: str
     object: str
-    
-    @validator('letter')
-    def validate_letter(cls, v):
-        if len(v) != 1 or not v.isalpha():
+
+    @model_validator(mode='after')
+    def validate_letter_and_object(self):
+        # One validator frame per letter instead of two — a 20-letter
+        # request dispatches 20 of these, so the overhead is per-item
+        if len(self.letter) != 1 or not self.letter.isalpha():
             raise ValueError('Letter must be a single alphabetic character')
-        return v.upper()
-    
-    @validator('object')
-    def validate_object(cls, v):
-        if not v.strip():
+        if not self.object:
             raise ValueError('Object description cannot be empty')
-        return v.strip()
+        self.letter = self.letter.upper()
+        return self
 
 class BannerGenerationRequest(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     name: str
     letters: List[LetterRequest]
     color_palette: str = "earthy_vintage"
     model: str = "gemini-3-pro-image-preview"
-    
-    @validator('name')
+
+    @field_validator('name')
+    @classmethod
     def validate_name(cls, v):
-        if not v.strip():
+        if not v:
             raise ValueError('Name cannot be empty')
-        # Check if name matches letters
-        name_letters = [c.upper() for c in v.strip() if c.isalpha()]
-        return v.strip()
-    
-    @validator('letters')
+        return v
+
+    @field_validator('letters')
+    @classmethod
     def validate_letters(cls, v):
         if not v:
             raise ValueError('At least one letter is required')
         if len(v) > 20:  # Reasonable limit
             raise ValueError('Maximum 20 letters allowed')
         return v
-    
-    @validator('color_palette')
+
+    @field_validator('color_palette')
+    @classmethod
     def validate_palette(cls, v):
-        if v not in COLOR_PALETTES and v != "custom":
+        if v not in _VALID_PALETTES:
             raise ValueError(f'Invalid color palette. Must be one of: {list(COLOR_PALETTES.keys())} or "custom"')
         return v
-    
-    @validator('model')
+
+    @field_validator('model')
+    @classmethod
     def validate_model(cls, v):
-        if v not in config.SUPPORTED_MODELS:
+        if v not in _VALID_MODELS:
             raise ValueError(f'Invalid model. Must be one of: {list(config.SUPPORTED_MODELS.keys())}')
         return v
 
@@ -116,65 +186,110 @@ class JobStatus(BaseModel):
 async def startup_event():
     """Initialize the application on startup."""
     print("🚀 Starting Letter Banner Generator Web Service")
+
+    # Buffered logging for the generation modules
+    setup_logging()
+
+    # Load API keys and surface misconfiguration at startup, not per request
+    api_keys = load_api_key()
+    if not any(api_keys.values()):
+        print("❌ No API keys found. Service may not function properly.")
     
-    # Load API key
-    if not load_api_key():
-        print("❌ Failed to load OpenAI API key. Service may not function properly.")
-    
-    # Create output directory
-    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    # Create output directory (one stat on warm starts where it exists)
+    if not os.path.isdir(config.OUTPUT_DIR):
+        os.makedirs(config.OUTPUT_DIR, exist_ok=True)
     
     # Start cleanup task
     asyncio.create_task(cleanup_old_jobs())
     
     print("✅ Service initialized successfully")
 
+# Rendered once on first hit: the page depends only on the static
+# COLOR_PALETTES (the template never touches request/url_for), so the
+# per-request Jinja render was wasted work
+_home_cache = None
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Serve the main application page."""
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "color_palettes": COLOR_PALETTES
-    })
+    global _home_cache
+    if _home_cache is None:
+        html = templates.get_template("index.html").render(
+            {"color_palettes": COLOR_PALETTES}
+        )
+        etag = f'"{hashlib.md5(html.encode()).hexdigest()}"'
+        _home_cache = (html, etag)
+    html, etag = _home_cache
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return HTMLResponse(html, headers={"ETag": etag})
+
+def _static_json(payload):
+    """Serialize a static payload once, with an ETag for client caching."""
+    body = orjson.dumps(payload)
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    return body, etag
+
+
+def _static_json_response(request: Request, body, etag):
+    """Serve a pre-serialized payload, or 304 if the client already has it."""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+# These payloads never change after import — serialize them once instead of
+# re-encoding identical bytes for every caller
+_PALETTES_BODY, _PALETTES_ETAG = _static_json({"palettes": COLOR_PALETTES})
+_MODELS_BODY, _MODELS_ETAG = _static_json({
+    "models": config.SUPPORTED_MODELS,
+    "default_model": config.DEFAULT_MODEL
+})
 
 @app.get("/api/palettes")
-async def get_color_palettes():
+async def get_color_palettes(request: Request):
     """Get available color palettes."""
-    return {"palettes": COLOR_PALETTES}
+    return _static_json_response(request, _PALETTES_BODY, _PALETTES_ETAG)
 
 @app.get("/api/models")
-async def get_available_models():
+async def get_available_models(request: Request):
     """Get available image generation models with pricing and features."""
-    return {
-        "models": config.SUPPORTED_MODELS,
-        "default_model": config.DEFAULT_MODEL
-    }
+    return _static_json_response(request, _MODELS_BODY, _MODELS_ETAG)
 
 class ThemeVariationRequest(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     name: str
     theme: str
     model: str = "gemini-2.0-flash-exp"
-    
-    @validator('name')
+
+    @field_validator('name')
+    @classmethod
     def validate_name(cls, v):
-        if not v.strip():
+        if not v:
             raise ValueError('Name cannot be empty')
-        return v.strip()
-    
-    @validator('theme')
+        return v
+
+    @field_validator('theme')
+    @classmethod
     def validate_theme(cls, v):
-        if not v.strip():
+        if not v:
             raise ValueError('Theme cannot be empty')
-        return v.strip()
+        return v
 
 @app.post("/api/generate-theme-variations")
 async def generate_theme_variations_api(request: ThemeVariationRequest):
     """Generate creative theme variations for each letter from a single overarching theme."""
     try:
-        variations = generate_theme_variations(
-            name=request.name,
-            theme=request.theme,
-            model=request.model
+        # The generator blocks on a 1-3s LLM round trip; run it in the
+        # worker pool so the event loop keeps serving other requests
+        variations = await asyncio.get_running_loop().run_in_executor(
+            executor,
+            lambda: generate_theme_variations(
+                name=request.name,
+                theme=request.theme,
+                model=request.model
+            )
         )
         
         if variations:
@@ -200,47 +315,83 @@ async def generate_banner(
     job_id = str(uuid.uuid4())
     
     # Initialize job status
-    job_status = {
-        "job_id": job_id,
-        "status": "pending",
-        "progress": 0,
-        "current_step": "Initializing...",
-        "total_letters": len(request.letters),
-        "completed_letters": 0,
-        "error_message": None,
-        "created_at": datetime.now(),
-        "completed_at": None,
-        "files": None,
-        "request_data": request.dict()
-    }
-    
+    job_status = JobRecord(
+        job_id=job_id,
+        status="pending",
+        progress=0,
+        current_step="Initializing...",
+        total_letters=len(request.letters),
+        completed_letters=0,
+        created_at=datetime.now(),
+        request_data=request.model_dump()
+    )
+
     jobs_storage[job_id] = job_status
-    
+    heapq.heappush(_expiry_heap, (time.time() + MAX_JOB_AGE, job_id))
+
+    global active_jobs_count
+    active_jobs_count += 1
+
     # Start background generation
     background_tasks.add_task(process_banner_generation, job_id, request)
     
     return {"job_id": job_id, "status": "pending", "message": "Banner generation started"}
 
 @app.get("/api/status/{job_id}")
-async def get_job_status(job_id: str):
+async def get_job_status(job_id: str, request: Request):
     """Get the current status of a banner generation job."""
     if job_id not in jobs_storage:
         raise HTTPException(status_code=404, detail="Job not found")
-    
+
     job = jobs_storage[job_id]
-    
-    return JobStatus(
-        job_id=job["job_id"],
-        status=job["status"],
-        progress=job["progress"],
-        current_step=job["current_step"],
-        total_letters=job["total_letters"],
-        completed_letters=job["completed_letters"],
-        error_message=job.get("error_message"),
-        created_at=job["created_at"],
-        completed_at=job.get("completed_at"),
-        files=job.get("files")
-    )
+
+    # Skip model construction and FastAPI's jsonable_encoder entirely:
+    # every field was produced internally by process_banner_generation, and
+    # orjson serializes the dict (datetimes included) straight to bytes.
+    # This is the hottest endpoint — the frontend polls it continuously,
+    # and between mutations the bytes are identical, so the ETag turns
+    # most polls into bodyless 304s. JobStatus above stays as the
+    # documented shape of this payload.
+    body, etag = _static_json({
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "current_step": job["current_step"],
+        "total_letters": job["total_letters"],
+        "completed_letters": job["completed_letters"],
+        "error_message": job.get("error_message"),
+        "created_at": job["created_at"],
+        "completed_at": job.get("completed_at"),
+        "files": job.get("files"),
+    })
+    return _static_json_response(request, body, etag)
+
+@app.websocket("/ws/status/{job_id}")
+async def job_status_websocket(websocket: WebSocket, job_id: str):
+    """Push job status updates as they happen instead of being polled."""
+    await websocket.accept()
+    if job_id not in jobs_storage:
+        await websocket.close(code=4004)
+        return
+
+    queue = asyncio.Queue()
+    _status_watchers.setdefault(job_id, set()).add(queue)
+    try:
+        # Send the current state immediately so late subscribers aren't
+        # blank until the next letter finishes
+        snapshot = _status_snapshot(jobs_storage[job_id])
+        await websocket.send_json(snapshot)
+        while snapshot["status"] not in ("completed", "failed"):
+            snapshot = await queue.get()
+            await websocket.send_json(snapshot)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        watchers = _status_watchers.get(job_id)
+        if watchers is not None:
+            watchers.discard(queue)
+            if not watchers:
+                _status_watchers.pop(job_id, None)
 
 @app.get("/api/download/{job_id}/{file_type}")
 async def download_file(job_id: str, file_type: str):
@@ -257,10 +408,14 @@ async def download_file(job_id: str, file_type: str):
         raise HTTPException(status_code=404, detail="File not found")
     
     file_path = job["files"][file_type]
-    
-    if not os.path.exists(file_path):
+
+    # One stat through a worker thread doubles as the existence check and
+    # feeds FileResponse so it doesn't stat again on the send path
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File no longer exists")
-    
+
     # Determine the appropriate filename for download
     if file_type == "banner":
         filename = f"{job['request_data']['name']}_banner.png"
@@ -268,22 +423,29 @@ async def download_file(job_id: str, file_type: str):
         filename = f"{job['request_data']['name']}_letters.pdf"
     else:
         filename = os.path.basename(file_path)
-    
+
+    # FileResponse takes the server's zero-copy send path where available
+    # (ASGI pathsend / sendfile) — the real media type instead of
+    # octet-stream keeps intermediaries from buffering to sniff
     return FileResponse(
         path=file_path,
         filename=filename,
-        media_type='application/octet-stream'
+        media_type='application/pdf' if file_path.endswith('.pdf') else 'image/png',
+        stat_result=stat_result
     )
 
 class EditLetterRequest(BaseModel):
+    model_config = ConfigDict(str_strip_whitespace=True)
+
     edit_prompt: str
     model: str = "gemini-3-pro-image-preview"
-    
-    @validator('edit_prompt')
+
+    @field_validator('edit_prompt')
+    @classmethod
     def validate_prompt(cls, v):
-        if not v.strip():
+        if not v:
             raise ValueError('Edit prompt cannot be empty')
-        return v.strip()
+        return v
 
 @app.post("/api/edit-letter/{job_id}/{letter_index}")
 async def edit_letter(job_id: str, letter_index: int, request: EditLetterRequest, background_tasks: BackgroundTasks):
@@ -305,8 +467,8 @@ async def edit_letter(job_id: str, letter_index: int, request: EditLetterRequest
         raise HTTPException(status_code=404, detail=f"Letter {letter_index} not found")
     
     original_path = job["files"][letter_key]
-    
-    if not os.path.exists(original_path):
+
+    if not await asyncio.to_thread(os.path.exists, original_path):
         raise HTTPException(status_code=404, detail="Original image file not found")
     
     # Create edited filename
@@ -317,8 +479,9 @@ async def edit_letter(job_id: str, letter_index: int, request: EditLetterRequest
     
     # Perform the edit
     try:
-        result_path = await asyncio.get_event_loop().run_in_executor(
-            executor,
+        # to_thread uses the loop's default pool — edits don't queue behind
+        # a full batch of letter-generation calls in the shared executor
+        result_path = await asyncio.to_thread(
             edit_letter_image,
             original_path,
             request.edit_prompt,
@@ -343,7 +506,8 @@ async def edit_letter(job_id: str, letter_index: int, request: EditLetterRequest
                 "original_path": original_path,
                 "edited_path": result_path
             })
-            
+            jobs_storage.save(job_id)
+
             return {
                 "success": True,
                 "message": "Letter edited successfully",
@@ -387,14 +551,15 @@ async def generate_pdf_endpoint(job_id: str):
         name = request_data.get("name", "BANNER")
         
         # Extract timestamp from existing files
-        import re
         first_file = os.path.basename(letter_paths[0])
-        timestamp_match = re.search(r'_(\d{8}_\d{6})', first_file)
+        timestamp_match = _TIMESTAMP_RE.search(first_file)
         run_timestamp = timestamp_match.group(1) if timestamp_match else datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # Generate PDF with current images
-        pdf_path = await asyncio.get_event_loop().run_in_executor(
-            executor,
+        # Generate PDF with current images in a worker process — this is
+        # the one fully CPU-bound batch job left, and a process keeps it
+        # off both the event loop and the GIL
+        pdf_path = await asyncio.get_running_loop().run_in_executor(
+            process_executor,
             create_pdf_with_all_letters,
             letter_paths,
             config.OUTPUT_DIR,
@@ -405,7 +570,8 @@ async def generate_pdf_endpoint(job_id: str):
         if pdf_path:
             # Update job storage with PDF path
             job["files"]["pdf"] = pdf_path
-            
+            jobs_storage.save(job_id)
+
             return {
                 "success": True,
                 "message": "PDF generated successfully",
@@ -420,11 +586,14 @@ async def generate_pdf_endpoint(job_id: str):
 
 async def process_banner_generation(job_id: str, request: BannerGenerationRequest):
     """Process banner generation in the background."""
+    global active_jobs_count
     job = jobs_storage[job_id]
-    
+
     try:
         job["status"] = "processing"
         job["current_step"] = "Setting up generation..."
+        jobs_storage.save(job_id)
+        _push_status(job_id, job)
         
         # Create timestamp for this run
         run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -447,55 +616,75 @@ async def process_banner_generation(job_id: str, request: BannerGenerationReques
         job["current_step"] = f"Generating all {len(request.letters)} letters simultaneously with {model_info['name']}..."
         job["progress"] = 10
         
-        # Create tasks for all letters
-        loop = asyncio.get_event_loop()
-        letter_tasks = []
-        
-        for i, letter_req in enumerate(request.letters):
-            task = loop.run_in_executor(
-                executor,
-                generate_stylized_letter,
-                letter_req.letter,
-                letter_req.object,
-                config.OUTPUT_DIR,
-                run_timestamp,
-                color_palette,
-                request.model
-            )
-            letter_tasks.append((i, letter_req.letter, task))
+        # Create tasks for all letters, each gated by the shared semaphore
+        # so a 20-letter job can't exceed the provider's concurrency limit
+        loop = asyncio.get_running_loop()
+
+        async def _generate_bounded(letter_req):
+            async with api_semaphore:
+                return await loop.run_in_executor(
+                    executor,
+                    generate_stylized_letter,
+                    letter_req.letter,
+                    letter_req.object,
+                    config.OUTPUT_DIR,
+                    run_timestamp,
+                    color_palette,
+                    request.model
+                )
+
+        letter_tasks = [
+            (i, letter_req.letter, asyncio.create_task(_generate_bounded(letter_req)))
+            for i, letter_req in enumerate(request.letters)
+        ]
         
-        # Wait for letters to complete and update progress in real-time
-        generated_letter_paths = []
+        # Process letters as they finish so progress/completed_letters move
+        # in real time for the polling frontend, instead of sitting at 10%
+        # until gather() returns everything at once
         completed_count = 0
         letter_errors = []
+        results_by_index = {}
 
-        # Wait for all tasks to complete and collect results
-        results = await asyncio.gather(*[task for _, _, task in letter_tasks], return_exceptions=True)
+        # Compose each letter into the banner/PDF while the remaining API
+        # calls are still in flight — by the time the slowest letter lands,
+        # the layout work is already done and finalize() only has to save
+        assembler = BannerAssembler(len(request.letters), config.OUTPUT_DIR, run_timestamp)
+        compose_tasks = []
 
-        # Process results and update progress
-        for (i, letter, _), result in zip(letter_tasks, results):
+        async def _finish_letter(i, letter, task):
             try:
-                if isinstance(result, Exception):
-                    error_msg = str(result)
-                    print(f"⚠️ Error generating letter '{letter}': {error_msg}")
-                    letter_errors.append(f"'{letter}': {error_msg}")
-                    continue
-
-                if result:  # result is the letter_path
-                    generated_letter_paths.append(result)
-                    completed_count += 1
-                    job["completed_letters"] = completed_count
-                    job["progress"] = 10 + int((completed_count / len(request.letters)) * 70)  # 10-80%
-                    job["current_step"] = f"Generated letter '{letter}' ({completed_count}/{len(request.letters)} complete)"
-                    print(f"✅ Completed letter '{letter}' ({completed_count}/{len(request.letters)})")
-                else:
-                    print(f"⚠️ Failed to generate letter '{letter}'")
-                    letter_errors.append(f"'{letter}': returned no result")
+                return i, letter, await task, None
             except Exception as e:
-                print(f"⚠️ Error processing letter '{letter}': {e}")
-                letter_errors.append(f"'{letter}': {e}")
+                return i, letter, None, e
+
+        pending = [_finish_letter(i, letter, task) for i, letter, task in letter_tasks]
+        for next_done in asyncio.as_completed(pending):
+            i, letter, result, error = await next_done
+            if error is not None:
+                print(f"⚠️ Error generating letter '{letter}': {error}")
+                letter_errors.append(f"'{letter}': {error}")
                 continue
 
+            if result:  # result is the letter_path
+                results_by_index[i] = result
+                compose_tasks.append(
+                    loop.run_in_executor(executor, assembler.add_letter, i, result)
+                )
+                completed_count += 1
+                job["completed_letters"] = completed_count
+                job["progress"] = 10 + int((completed_count / len(request.letters)) * 70)  # 10-80%
+                job["current_step"] = f"Generated letter '{letter}' ({completed_count}/{len(request.letters)} complete)"
+                jobs_storage.save(job_id)
+                _push_status(job_id, job)
+                print(f"✅ Completed letter '{letter}' ({completed_count}/{len(request.letters)})")
+            else:
+                print(f"⚠️ Failed to generate letter '{letter}'")
+                letter_errors.append(f"'{letter}': returned no result")
+
+        # Banner order must follow the name, not completion order —
+        # reassemble by submission index
+        generated_letter_paths = [results_by_index[i] for i in sorted(results_by_index)]
+
         if not generated_letter_paths:
             # Build a descriptive error message from collected errors
             if letter_errors:
@@ -512,29 +701,18 @@ async def process_banner_generation(job_id: str, request: BannerGenerationReques
             else:
                 raise Exception("Failed to generate any letters (no details available)")
         
-        job["current_step"] = "Creating banner layout..."
-        job["progress"] = 85
-        
-        # Create printable banner layout
-        banner_path = await loop.run_in_executor(
-            executor,
-            create_banner_layout,
-            generated_letter_paths,
-            config.OUTPUT_DIR,
-            run_timestamp,
-            None  # Auto-calculate letters per row
-        )
-        
-        job["current_step"] = "Creating PDF compilation..."
-        job["progress"] = 95
-        
-        # Create PDF with all letters
-        pdf_path = await loop.run_in_executor(
+        job["current_step"] = "Composing banner and PDF..."
+        job["progress"] = 90
+
+        # The per-letter compose work overlapped the API calls above;
+        # finalize just saves (or falls back to the batch path if any
+        # letter failed and the grid needs recomputing)
+        if compose_tasks:
+            await asyncio.gather(*compose_tasks)
+        banner_path, pdf_path = await loop.run_in_executor(
             executor,
-            create_pdf_with_all_letters,
+            assembler.finalize,
             generated_letter_paths,
-            config.OUTPUT_DIR,
-            run_timestamp,
             request.name
         )
         
@@ -556,6 +734,7 @@ async def process_banner_generation(job_id: str, request: BannerGenerationReques
         
         job["files"] = files
         job["status"] = "completed"
+        active_jobs_count -= 1
         job["progress"] = 100
         job["current_step"] = "Banner generation completed!"
         job["completed_at"] = datetime.now()
@@ -568,98 +747,124 @@ async def process_banner_generation(job_id: str, request: BannerGenerationReques
             "model": model_info["name"]
         }
         
+        jobs_storage.save(job_id)
+        _push_status(job_id, job)
         print(f"✅ Banner generation completed for job {job_id}")
         print(f"💰 Estimated cost: ${estimated_cost:.2f} USD ({len(generated_letter_paths)} letters × ${cost_per_image})")
         
     except Exception as e:
         print(f"❌ Banner generation failed for job {job_id}: {e}")
         job["status"] = "failed"
+        active_jobs_count -= 1
         job["error_message"] = str(e)
         job["current_step"] = f"Generation failed: {str(e)}"
+        jobs_storage.save(job_id)
+        _push_status(job_id, job)
+
+def _remove_files(paths):
+    """Delete a batch of files, tolerating ones already gone."""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Failed to remove file {path}: {e}")
 
 async def cleanup_old_jobs():
-    """Periodically clean up old jobs and their files."""
+    """Expire jobs from the time-ordered heap as they come due."""
     while True:
+        # Sleep until the next expiry instead of a fixed interval, bounded
+        # so a long-empty heap still gets a periodic wakeup
+        if _expiry_heap:
+            sleep_for = min(max(_expiry_heap[0][0] - time.time(), 1.0), CLEANUP_INTERVAL)
+        else:
+            sleep_for = CLEANUP_INTERVAL
+        await asyncio.sleep(sleep_for)
+
         try:
-            await asyncio.sleep(CLEANUP_INTERVAL)
-            
-            current_time = datetime.now()
-            jobs_to_remove = []
-            
-            for job_id, job in jobs_storage.items():
-                job_age = current_time - job["created_at"]
-                
-                if job_age.total_seconds() > MAX_JOB_AGE:
-                    # Clean up files
-                    if job.get("files"):
-                        for file_path in job["files"].values():
-                            try:
-                                if os.path.exists(file_path):
-                                    os.remove(file_path)
-                            except Exception as e:
-                                print(f"Failed to remove file {file_path}: {e}")
-                    
-                    jobs_to_remove.append(job_id)
-            
-            # Remove old jobs from storage
-            for job_id in jobs_to_remove:
-                del jobs_storage[job_id]
+            files_to_remove = []
+            now = time.time()
+            while _expiry_heap and _expiry_heap[0][0] <= now:
+                _, job_id = heapq.heappop(_expiry_heap)
+                try:
+                    job = jobs_storage[job_id]
+                except KeyError:
+                    continue  # already gone (LRU eviction)
+                if job.get("files"):
+                    files_to_remove.extend(job["files"].values())
+                try:
+                    del jobs_storage[job_id]
+                except KeyError:
+                    continue  # local copy evicted; only the Redis mirror answered
                 print(f"🧹 Cleaned up old job: {job_id}")
-                
+
+            # All unlinks happen in one worker-thread hop instead of
+            # blocking the event loop once per file
+            if files_to_remove:
+                await asyncio.to_thread(_remove_files, files_to_remove)
+
         except Exception as e:
             print(f"Error in cleanup task: {e}")
 
-@app.get("/api/docs")
-async def api_documentation():
-    """API documentation endpoint."""
-    return {
-        "title": "Letter Banner Generator API",
-        "version": "1.0.0",
-        "description": "Create stylized letter banners where each letter is shaped like objects",
-        "endpoints": {
-            "POST /api/generate-banner": {
-                "description": "Start banner generation process",
-                "body": {
-                    "name": "string - Name for the banner",
-                    "letters": "array - List of {letter, object} pairs",
-                    "color_palette": "string - Color palette name"
-                },
-                "response": {"job_id": "string", "status": "string"}
-            },
-            "GET /api/status/{job_id}": {
-                "description": "Check generation progress",
-                "response": "JobStatus object with progress info"
-            },
-            "GET /api/download/{job_id}/{file_type}": {
-                "description": "Download generated files",
-                "file_types": ["banner", "pdf", "letter_0", "letter_1", "..."]
-            },
-            "GET /api/palettes": {
-                "description": "Get available color palettes",
-                "response": {"palettes": "object"}
+_API_DOCS_BODY, _API_DOCS_ETAG = _static_json({
+    "title": "Letter Banner Generator API",
+    "version": "1.0.0",
+    "description": "Create stylized letter banners where each letter is shaped like objects",
+    "endpoints": {
+        "POST /api/generate-banner": {
+            "description": "Start banner generation process",
+            "body": {
+                "name": "string - Name for the banner",
+                "letters": "array - List of {letter, object} pairs",
+                "color_palette": "string - Color palette name"
             },
-            "GET /health": {
-                "description": "Health check endpoint",
-                "response": {"status": "string", "active_jobs": "number"}
-            }
+            "response": {"job_id": "string", "status": "string"}
+        },
+        "GET /api/status/{job_id}": {
+            "description": "Check generation progress",
+            "response": "JobStatus object with progress info"
+        },
+        "GET /api/download/{job_id}/{file_type}": {
+            "description": "Download generated files",
+            "file_types": ["banner", "pdf", "letter_0", "letter_1", "..."]
+        },
+        "GET /api/palettes": {
+            "description": "Get available color palettes",
+            "response": {"palettes": "object"}
         },
-        "color_palettes": list(COLOR_PALETTES.keys()),
-        "limits": {
-            "max_letters": 20,
-            "max_name_length": 20,
-            "file_retention": "24 hours"
+        "GET /health": {
+            "description": "Health check endpoint",
+            "response": {"status": "string", "active_jobs": "number"}
         }
+    },
+    "color_palettes": list(COLOR_PALETTES.keys()),
+    "limits": {
+    "max_letters": 20,
+    "max_name_length": 20,
+    "file_retention": "24 hours"
     }
+})
+
+@app.get("/api/docs")
+async def api_documentation(request: Request):
+    """API documentation endpoint."""
+    return _static_json_response(request, _API_DOCS_BODY, _API_DOCS_ETAG)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
+    # Both gauges are O(1): the active count is maintained at status
+    # transitions and len() on the store is a dict len
     return {
         "status": "healthy",
-        "active_jobs": len([j for j in jobs_storage.values() if j["status"] in ["pending", "processing"]]),
+        "active_jobs": active_jobs_count,
         "total_jobs": len(jobs_storage)
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("web.app:app", host="0.0.0.0", port=8000, reload=True)
+    # Same stack as main.py: uvloop event loop + httptools parser. Use
+    # run.py for hot reload during development. Single worker on purpose —
+    # job state lives in this process.
+    uvicorn.run("web.app:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
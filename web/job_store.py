@@ -0,0 +1,176 @@
+"""
+Job state storage for the Letter Banner web service
+
+Jobs live in an in-process dict, which is all a single-worker deployment
+(Replit) needs. When REDIS_URL is set and the redis package is installed,
+every job snapshot is also mirrored to a `job:{id}` Redis key with a TTL,
+so status reads survive restarts and can be served by additional uvicorn
+workers sharing the same Redis. Redis being down never breaks the
+service — the store silently degrades to in-process only.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+import orjson
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Mirrored snapshots expire on their own — Redis TTL replaces the cleanup
+# loop for the external copy
+MAX_JOB_AGE = 24 * 3600
+
+# Hard ceiling on in-process jobs. The periodic cleanup loop handles the
+# normal 24h expiry; this cap is the backstop that keeps memory bounded
+# if a traffic spike outruns it
+MAX_JOBS = 10_000
+
+
+@dataclass(slots=True)
+class JobRecord:
+    """
+    One job's state, with a fixed field set instead of a 13-key dict.
+
+    slots=True stores fields in a compact array rather than a per-instance
+    __dict__, roughly halving per-job memory — which matters with the store
+    capped at 10,000 live jobs. Subscript access (job["status"], .get, in)
+    is kept so call sites read the same whether they got a JobRecord or a
+    plain dict from the Redis mirror.
+    """
+
+    job_id: str
+    status: str = "pending"
+    progress: int = 0
+    current_step: str = ""
+    total_letters: int = 0
+    completed_letters: int = 0
+    error_message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    files: Optional[Dict[str, str]] = None
+    request_data: Dict[str, Any] = field(default_factory=dict)
+    model_used: Optional[str] = None
+    cost_info: Optional[Dict[str, Any]] = None
+    edit_history: Optional[Dict[str, Any]] = None
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        # setattr on an unknown key raises AttributeError — a typo'd field
+        # name fails loudly instead of silently growing the record
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return getattr(self, key, None) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+class JobStore:
+    """Dict-like job store with LRU bounding and an optional Redis mirror."""
+
+    def __init__(self, max_age_seconds=MAX_JOB_AGE, max_jobs=MAX_JOBS):
+        self._jobs = OrderedDict()
+        self._max_age = max_age_seconds
+        self._max_jobs = max_jobs
+        self._redis = None
+
+        url = os.getenv("REDIS_URL")
+        if url and redis is not None:
+            try:
+                client = redis.Redis.from_url(url)
+                client.ping()
+                self._redis = client
+                print("✅ Job store mirroring to Redis")
+            except Exception as e:
+                print(f"⚠️ Redis unavailable ({e}) — job store is in-process only")
+
+    def __contains__(self, job_id):
+        return job_id in self._jobs or (
+            self._redis is not None and self._mirror_get(job_id) is not None
+        )
+
+    def __getitem__(self, job_id):
+        if job_id in self._jobs:
+            self._jobs.move_to_end(job_id)
+            return self._jobs[job_id]
+        mirrored = self._mirror_get(job_id)
+        if mirrored is None:
+            raise KeyError(job_id)
+        return mirrored
+
+    def __setitem__(self, job_id, job):
+        self._jobs[job_id] = job
+        self._jobs.move_to_end(job_id)
+        while len(self._jobs) > self._max_jobs:
+            evicted_id, evicted = self._jobs.popitem(last=False)
+            self._delete_files(evicted)
+            print(f"🗑️ Evicted job {evicted_id} (store at capacity)")
+        self.save(job_id)
+
+    def __delitem__(self, job_id):
+        del self._jobs[job_id]
+        if self._redis is not None:
+            try:
+                self._redis.delete(f"job:{job_id}")
+            except Exception:
+                pass
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def items(self):
+        return self._jobs.items()
+
+    def values(self):
+        return self._jobs.values()
+
+    def save(self, job_id):
+        """Push the job's current snapshot to the Redis mirror, if any."""
+        if self._redis is None:
+            return
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        try:
+            self._redis.set(
+                f"job:{job_id}",
+                orjson.dumps(job, default=str),
+                ex=self._max_age,
+            )
+        except Exception:
+            # Mirroring is best-effort; the in-process copy stays canonical
+            pass
+
+    @staticmethod
+    def _delete_files(job):
+        """Remove an evicted job's generated files so disk tracks memory."""
+        for path in (job.get("files") or {}).values():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Could not remove {path}: {e}")
+
+    def _mirror_get(self, job_id):
+        """Read a job snapshot from Redis (jobs owned by another worker)."""
+        if self._redis is None:
+            return None
+        try:
+            blob = self._redis.get(f"job:{job_id}")
+        except Exception:
+            return None
+        return orjson.loads(blob) if blob else None
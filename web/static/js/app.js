@@ -4,6 +4,7 @@ class BannerGenerator {
     constructor() {
         this.currentJobId = null;
         this.pollInterval = null;
+        this.statusSocket = null;
         this.colorPalettes = {};
         this.models = {};
         this.selectedModel = 'gemini-3-pro-image-preview';
@@ -338,7 +339,7 @@ class BannerGenerator {
             console.log(`✅ Generation started with job ID: ${this.currentJobId}`);
             
             this.hideLoading();
-            this.startPolling();
+            this.startStatusUpdates();
             
         } catch (error) {
             console.error('❌ Failed to start generation:', error);
@@ -422,6 +423,56 @@ class BannerGenerator {
         };
     }
 
+    startStatusUpdates() {
+        // Prefer push over the WebSocket endpoint — one message per actual
+        // progress change instead of a fetch every 2 seconds. Polling stays
+        // as the fallback for proxies/browsers that break the socket.
+        this.stopPolling();
+
+        if (!('WebSocket' in window)) {
+            this.startPolling();
+            return;
+        }
+
+        const proto = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        let socket;
+        try {
+            socket = new WebSocket(`${proto}//${window.location.host}/ws/status/${this.currentJobId}`);
+        } catch (error) {
+            console.warn('⚠️ WebSocket unavailable, falling back to polling:', error);
+            this.startPolling();
+            return;
+        }
+
+        this.statusSocket = socket;
+        let sawTerminal = false;
+
+        socket.onmessage = (event) => {
+            const status = JSON.parse(event.data);
+            this.updateProgress(status);
+
+            if (status.status === 'completed' || status.status === 'failed') {
+                sawTerminal = true;
+                socket.close();
+                // Push snapshots carry progress fields only — fetch the
+                // full record (files, cost info) once at the end
+                this.checkJobStatus();
+            }
+        };
+
+        socket.onclose = () => {
+            if (this.statusSocket === socket) {
+                this.statusSocket = null;
+            }
+            if (!sawTerminal && this.currentJobId) {
+                console.warn('⚠️ Status socket closed early — falling back to polling');
+                this.startPolling();
+            }
+        };
+
+        socket.onerror = () => socket.close();
+    }
+
     startPolling() {
         if (this.pollInterval) {
             clearInterval(this.pollInterval);
@@ -584,6 +635,14 @@ class BannerGenerator {
             clearInterval(this.pollInterval);
             this.pollInterval = null;
         }
+        if (this.statusSocket) {
+            // Detach onclose first so tearing down doesn't trigger the
+            // early-close polling fallback
+            const socket = this.statusSocket;
+            this.statusSocket = null;
+            socket.onclose = null;
+            socket.close();
+        }
     }
 
     async downloadFile(fileType) {
@@ -949,7 +1008,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
 // Handle page refresh/close during generation
 window.addEventListener('beforeunload', (e) => {
-    if (window.bannerGenerator && window.bannerGenerator.currentJobId && window.bannerGenerator.pollInterval) {
+    if (window.bannerGenerator && window.bannerGenerator.currentJobId &&
+        (window.bannerGenerator.pollInterval || window.bannerGenerator.statusSocket)) {
         e.preventDefault();
         e.returnValue = 'Banner generation is in progress. Are you sure you want to leave?';
         return e.returnValue;